@@ -0,0 +1,59 @@
+"""
+The bounded cache shared by the parser and zoneinfo.
+"""
+__license__ = "PSF License"
+
+class LRUCache(object):
+    """
+    A mapping that keeps the ``size`` most recently used entries, with O(1)
+    lookups, in a dict of [prev, next, key, value] links.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._map = {}
+        self._root = root = []
+        root[:] = [root, root, None, None]
+
+    def get(self, key, default=None):
+        link = self._map.get(key)
+        if link is None:
+            return default
+        # Move to the front.
+        prev, next = link[0], link[1]
+        prev[1], next[0] = next, prev
+        root = self._root
+        link[0], link[1] = root, root[1]
+        root[1][0] = link
+        root[1] = link
+        return link[3]
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def set(self, key, value):
+        if self.size <= 0:
+            return
+        if key in self._map:
+            self.get(key)
+            self._map[key][3] = value
+            return
+        root = self._root
+        link = [root, root[1], key, value]
+        root[1][0] = link
+        root[1] = link
+        self._map[key] = link
+        self.resize(self.size)
+
+    def resize(self, size):
+        self.size = size
+        root = self._root
+        while len(self._map) > max(size, 0):
+            link = root[0]
+            link[0][1] = root
+            root[0] = link[0]
+            del self._map[link[2]]
+
+    def clear(self):
+        self._map.clear()
+        self._root[:] = [self._root, self._root, None, None]
@@ -13,6 +13,8 @@ import string
 import time
 import sys
 import os
+import re
+import threading
 
 try:
     from cStringIO import StringIO
@@ -21,10 +23,16 @@ except ImportError:
 
 import relativedelta
 import tz
+from _cache import LRUCache
 
 
 __all__ = ["parse", "parserinfo"]
 
+# Number of string shapes whose token layout is remembered, and of exact
+# strings whose parse result is remembered, by each parser.
+PLANCACHESIZE = 200
+RESULTCACHESIZE = 1000
+
 
 # Some pointers:
 #
@@ -291,6 +299,9 @@ class parser(object):
 
     def __init__(self, info=None):
         self.info = info or parserinfo()
+        self._plans = LRUCache(PLANCACHESIZE)
+        self._results = LRUCache(RESULTCACHESIZE)
+        self._lock = threading.Lock()
 
     def parse(self, timestr, default=None,
                     ignoretz=False, tzinfos=None,
@@ -345,8 +356,70 @@ class parser(object):
             dayfirst = info.dayfirst
         if yearfirst is None:
             yearfirst = info.yearfirst
+        if not isinstance(timestr, basestring):
+            # A stream; read it token by token.
+            return self._parse_tokens(_timelex.split(timestr),
+                                      dayfirst, yearfirst, fuzzy)
+        if isinstance(timestr, unicode):
+            # _timelex reads through a byte buffer, so this is what it sees.
+            timestr = str(timestr)
+        key = (timestr, bool(dayfirst), bool(yearfirst), bool(fuzzy))
+        self._lock.acquire()
+        try:
+            values = self._results.get(key, _missing)
+        finally:
+            self._lock.release()
+        if values is _missing:
+            res = self._parse_tokens(self._split(timestr),
+                                     dayfirst, yearfirst, fuzzy)
+            if res is not None:
+                values = tuple([getattr(res, attr)
+                                for attr in res.__slots__])
+            else:
+                values = None
+            self._lock.acquire()
+            try:
+                self._results.set(key, values)
+            finally:
+                self._lock.release()
+            return res
+        if values is None:
+            return None
+        res = self._result()
+        for attr, value in zip(res.__slots__, values):
+            setattr(res, attr, value)
+        return res
+
+    def _split(self, timestr):
+        # The tokens of a string only depend on its shape: the string with
+        # every digit replaced by "0". The first string of a shape is split
+        # by _timelex and its tokens are compiled into a plan, a format
+        # string with a %s for every run of digits and the tokens separated
+        # by NULs (which _timelex drops, so no token has one). Later
+        # strings of the same shape are split by filling in the plan.
+        shape = timestr.translate(_shapetable)
+        digits = _digits.findall(timestr)
+        self._lock.acquire()
+        try:
+            plan = self._plans.get(shape, _missing)
+        finally:
+            self._lock.release()
+        if plan is None:
+            return _timelex.split(timestr)
+        elif plan is not _missing:
+            return (plan % tuple(digits)).split("\x00")
+        tokens = _timelex.split(timestr)
+        plan = _compileplan(tokens, digits)
+        self._lock.acquire()
+        try:
+            self._plans.set(shape, plan)
+        finally:
+            self._lock.release()
+        return tokens
+
+    def _parse_tokens(self, l, dayfirst, yearfirst, fuzzy):
+        info = self.info
         res = self._result()
-        l = _timelex.split(timestr)
         try:
 
             # year/month/day list
@@ -689,6 +762,31 @@ class parser(object):
             return None
         return res
 
+_missing = object()
+_digits = re.compile("[0-9]+")
+_shapetable = string.maketrans("123456789", "000000000")
+
+def _compileplan(tokens, digits):
+    """
+    Returns the plan that splits strings shaped like the one ``tokens``
+    and ``digits`` came from, or None if the tokens can't be rebuilt from
+    the digits (a run of digits broken up by a NUL, say) so the string must
+    always go through _timelex.
+    """
+    if not tokens:
+        return None
+    runs = []
+    formats = []
+    for token in tokens:
+        if not token or "\x00" in token:
+            return None
+        runs.extend(_digits.findall(token))
+        formats.append("%s".join([part.replace("%", "%%")
+                                  for part in _digits.split(token)]))
+    if runs != digits:
+        return None
+    return "\x00".join(formats)
+
 DEFAULTPARSER = parser()
 def parse(timestr, parserinfo=None, **kwargs):
     if parserinfo:
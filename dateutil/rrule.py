@@ -396,6 +396,105 @@ class rrule(rrulebase):
             self._timeset.sort()
             self._timeset = tuple(self._timeset)
 
+        self._step = self._simple_step()
+
+    def _simple_step(self):
+        # The number of seconds between two occurrences when they are
+        # just dtstart plus multiples of a fixed step (no BY* rules
+        # other than those implied by dtstart, no timezone), so that
+        # after(), before() and between() can seek straight to the
+        # right occurrence instead of generating every earlier one.
+        # None for all other rules.
+        dtstart = self._dtstart
+        freq = self._freq
+        if (self._tzinfo or self._bysetpos or self._bymonth or
+            self._byweekno or self._byyearday or self._byeaster or
+            self._bymonthday or self._bynmonthday or self._bynweekday):
+            return None
+        if freq == WEEKLY:
+            if self._byweekday != (dtstart.weekday(),):
+                return None
+        elif freq < WEEKLY or self._byweekday is not None:
+            return None
+        for value, default, byfreq in ((self._byhour, dtstart.hour, HOURLY),
+                                       (self._byminute, dtstart.minute, MINUTELY),
+                                       (self._bysecond, dtstart.second, SECONDLY)):
+            if freq < byfreq:
+                if value != (default,):
+                    return None
+            elif value is not None:
+                return None
+        return {WEEKLY: 7*86400, DAILY: 86400, HOURLY: 3600,
+                MINUTELY: 60, SECONDLY: 1}[freq]*self._interval
+
+    def _can_seek(self, *dts):
+        if self._step is None or self._cache_complete:
+            return False
+        for dt in dts:
+            if type(dt) is not datetime.datetime or dt.tzinfo:
+                return False
+        return True
+
+    def _occurrence(self, n):
+        # The n-th occurrence, or None past count or until. Raises
+        # OverflowError past MAXYEAR.
+        if n < 0 or (self._count and n >= self._count):
+            return None
+        res = self._dtstart+datetime.timedelta(seconds=n*self._step)
+        if self._until and res > self._until:
+            return None
+        return res
+
+    def _seek(self, dt, inc):
+        # The index of the first occurrence after dt (or at dt if inc).
+        delta = dt-self._dtstart
+        if delta < datetime.timedelta(0):
+            return 0
+        n, rest = divmod(delta.days*86400+delta.seconds, self._step)
+        if rest or delta.microseconds or not inc:
+            n += 1
+        return n
+
+    def after(self, dt, inc=False):
+        if not self._can_seek(dt):
+            return rrulebase.after(self, dt, inc)
+        try:
+            return self._occurrence(self._seek(dt, inc))
+        except OverflowError:
+            # Past MAXYEAR, where the generator stops as well.
+            return None
+
+    def before(self, dt, inc=False):
+        if not self._can_seek(dt):
+            return rrulebase.before(self, dt, inc)
+        # The occurrence before the first one not before dt.
+        n = self._seek(dt, not inc)-1
+        if self._count:
+            n = min(n, self._count-1)
+        try:
+            res = self._occurrence(n)
+            if res is None and n >= 0 and self._until:
+                # Past until: the last occurrence not after it.
+                res = self._occurrence(self._seek(self._until, False)-1)
+        except OverflowError:
+            return rrulebase.before(self, dt, inc)
+        return res
+
+    def between(self, after, before, inc=False):
+        if not self._can_seek(after, before):
+            return rrulebase.between(self, after, before, inc)
+        l = []
+        n = self._seek(after, inc)
+        while True:
+            try:
+                res = self._occurrence(n)
+            except OverflowError:
+                return l
+            if res is None or res > before or (res == before and not inc):
+                return l
+            l.append(res)
+            n += 1
+
     def _iter(self):
         year, month, day, hour, minute, second, weekday, yearday, _ = \
             self._dtstart.timetuple()
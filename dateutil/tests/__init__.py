@@ -0,0 +1,5 @@
+from test_cache import LRUCacheTest
+from test_parser import ParserCacheTest
+from test_rrule import RruleSeekTest
+from test_tz import TzfileTest
+from test_zoneinfo import ZoneStoreTest
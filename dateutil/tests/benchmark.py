@@ -0,0 +1,68 @@
+"""
+Micro-benchmarks for the dateutil lookups the test modules check against
+their plain versions.
+
+    python -m dateutil.tests.benchmark [name ...]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from dateutil.parser import parser, _timelex
+from dateutil.rrule import rrule, rrulebase, MINUTELY, HOURLY, SECONDLY
+from dateutil.zoneinfo import gettz
+
+from dateutil.tests.test_tz import linear_ttinfo
+
+def timed(label, function, *args):
+    start = time.time()
+    function(*args)
+    print "%-50s %.4fs" % (label, time.time() - start)
+
+def tz():
+    eastern = gettz("US/Eastern")
+    spread = [datetime(2009, 1, 1) + timedelta(seconds=i * 315) for i in range(100000)]
+    week = [datetime(2009, 3, 5) + timedelta(seconds=i * 6) for i in range(100000)]
+    def linear(dts):
+        for dt in dts:
+            linear_ttinfo(eastern, dt)
+    def bisect(dts):
+        for dt in dts:
+            eastern._find_ttinfo(dt)
+    timed("tz: linear, spread over 2009", linear, spread)
+    timed("tz: bisect, spread over 2009", bisect, spread)
+    timed("tz: linear, within one week", linear, week)
+    timed("tz: bisect, within one week", bisect, week)
+
+def rrules():
+    now = datetime(2009, 6, 1, 12, 0, 0, 5)
+    rules = [("MINUTELY, 30 days old", rrule(MINUTELY, dtstart=now - timedelta(days=30))),
+             ("MINUTELY/20, one year old", rrule(MINUTELY, interval=20, dtstart=now - timedelta(days=365))),
+             ("SECONDLY, one day old", rrule(SECONDLY, dtstart=now - timedelta(days=1))),
+             ("HOURLY, two years old", rrule(HOURLY, dtstart=now - timedelta(days=730)))]
+    for label, rule in rules:
+        timed("rrule: generator, %s" % label, rrulebase.after, rule, now)
+        timed("rrule: seek, %s" % label, rule.after, now)
+
+def parse():
+    start = datetime(2009, 1, 1)
+    dts = [start + timedelta(seconds=i * 7919) for i in range(20000)]
+    for label, strings in (("distinct ISO datetimes", [dt.isoformat() for dt in dts]),
+                           ("distinct ctime-style strings", [dt.ctime() for dt in dts]),
+                           ("one repeated string", ["Thu Sep 25 10:36:28 2003"] * 20000)):
+        def slow():
+            p = parser()
+            for timestr in strings:
+                p._parse_tokens(_timelex.split(timestr), False, False, False)
+        def cached():
+            p = parser()
+            for timestr in strings:
+                p._parse(timestr)
+        timed("parse: _timelex, %s" % label, slow)
+        timed("parse: cached, %s" % label, cached)
+
+BENCHMARKS = ["tz", "rrules", "parse"]
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        globals()[name]()
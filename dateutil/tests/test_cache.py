@@ -0,0 +1,50 @@
+import unittest
+
+from dateutil._cache import LRUCache
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assert_("a" in cache)
+        self.failIf("b" in cache)
+        self.assertEqual(cache.get("b", "missing"), "missing")
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_set_existing_key(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("a", 10)
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 10)
+        self.failIf("b" in cache)
+
+    def test_resize_and_clear(self):
+        cache = LRUCache(3)
+        for key in "abc":
+            cache.set(key, key)
+        cache.get("a")
+        cache.resize(1)
+        self.assertEqual([key for key in "abc" if key in cache], ["a"])
+        cache.clear()
+        self.failIf("a" in cache)
+        cache.set("d", "d")
+        self.assertEqual(cache.get("d"), "d")
+
+    def test_size_zero_keeps_nothing(self):
+        cache = LRUCache(0)
+        cache.set("a", 1)
+        self.failIf("a" in cache)
+
+    def test_none_is_a_value(self):
+        # gettz caches the misses too
+        cache = LRUCache(1)
+        cache.set("a", None)
+        self.assert_("a" in cache)
+
+if __name__ == "__main__":
+    unittest.main()
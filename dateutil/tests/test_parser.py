@@ -0,0 +1,127 @@
+import random
+import unittest
+
+from dateutil.parser import parser, _timelex
+
+MONTHS = ["Jan", "February", "mar", "Sept", "OCT", "December"]
+DAYS = ["Mon", "Tuesday", "wed", "Sat", "SUNDAY"]
+TZ = ["UTC", "GMT", "Z", "EST", "BRST", "PST", "+0300", "-03:00", "-3", "GMT+3",
+      "BRST-0300 (BRST)", "-0300 (BRST)"]
+
+class StringMaker(object):
+    """ random date-like strings, with some junk, '%' and NUL mixed in """
+
+    def __init__(self, seed):
+        self.rand = random.Random(seed)
+
+    def num(self, lo, hi, width=None):
+        value = self.rand.randint(lo, hi)
+        if width and self.rand.random() < .7:
+            return "%0*d" % (width, value)
+        return str(value)
+
+    def piece(self):
+        rand, num = self.rand, self.num
+        return rand.choice([
+            lambda: "%s-%s-%s" % (num(0, 2099, 4), num(0, 19, 2), num(0, 39, 2)),
+            lambda: "%s/%s/%s" % (num(0, 39, 2), num(0, 39, 2), num(0, 2099, rand.choice([2, 4]))),
+            lambda: "%s.%s.%s" % (num(0, 39, 2), num(0, 19, 2), num(0, 99, 2)),
+            lambda: "%s:%s:%s" % (num(0, 29, 2), num(0, 69, 2), num(0, 69, 2)),
+            lambda: "%s:%s:%s.%s" % (num(0, 29, 2), num(0, 69, 2), num(0, 69, 2), num(0, 999999, 6)),
+            lambda: "%s%s%s" % (num(0, 2099, 4), num(0, 19, 2), num(0, 39, 2)),
+            lambda: "%s%s%sT%s%s%s" % (num(1900, 2099, 4), num(0, 19, 2), num(0, 39, 2),
+                                       num(0, 29, 2), num(0, 69, 2), num(0, 69, 2)),
+            lambda: rand.choice(MONTHS),
+            lambda: rand.choice(DAYS),
+            lambda: rand.choice(TZ),
+            lambda: num(0, 3000, rand.choice([None, 2, 4])),
+            lambda: "%s%s" % (num(0, 14), rand.choice(["am", "pm", "a.m.", "h", "m", "s", " hours", "th"])),
+            lambda: "%sh%sm%ss" % (num(0, 24), num(0, 69), num(0, 69)),
+            lambda: "%s of %s" % (rand.choice(MONTHS), num(0, 99, 2)),
+            lambda: "%s-%s-%s" % (num(0, 39, 2), rand.choice(MONTHS), num(0, 2099, 2)),
+            lambda: rand.choice(["at", "on", "and", ",", "T", "of", "x", "%", "%s", "\x00", "..", "."]),
+            lambda: "".join([rand.choice("0123456789.:-/ aZ%\x00") for i in range(rand.randint(1, 8))]),
+        ])()
+
+    def string(self):
+        sep = self.rand.choice([" ", ", ", "T", "", "  "])
+        return sep.join([self.piece() for i in range(self.rand.randint(1, 5))])
+
+    def flags(self):
+        kwargs = {}
+        for flag in ("dayfirst", "yearfirst", "fuzzy"):
+            if self.rand.random() < .3:
+                kwargs[flag] = True
+        return kwargs
+
+def outcome(function, *args, **kwargs):
+    try:
+        return repr(function(*args, **kwargs))
+    except Exception, e:
+        return "raised %s" % type(e).__name__
+
+class ParserCacheTest(unittest.TestCase):
+    """
+    The result cache and the replayed token plans give what splitting every
+    string with _timelex and running the token loop gives.
+    """
+
+    def setUp(self):
+        self.parser = parser()
+
+    def slow(self, timestr, dayfirst=None, yearfirst=None, fuzzy=False):
+        info = self.parser.info
+        if dayfirst is None:
+            dayfirst = info.dayfirst
+        if yearfirst is None:
+            yearfirst = info.yearfirst
+        return self.parser._parse_tokens(_timelex.split(timestr), dayfirst, yearfirst, fuzzy)
+
+    def assertSameParse(self, timestr, **kwargs):
+        self.assertEqual(self.parser._split(timestr), _timelex.split(timestr),
+                         "split %r" % timestr)
+        self.assertEqual(outcome(self.parser._parse, timestr, **kwargs),
+                         outcome(self.slow, timestr, **kwargs),
+                         "parse %r %r" % (timestr, kwargs))
+
+    def test_random_strings(self):
+        maker = StringMaker(24)
+        strings = []
+        for i in range(3000):
+            timestr = maker.string()
+            strings.append(timestr)
+            if maker.rand.random() < .3:
+                timestr = maker.rand.choice(strings)
+            self.assertSameParse(timestr, **maker.flags())
+
+    def test_same_shape_different_digits(self):
+        for timestr in ["2003-09-25T10:49:41", "2003-09-25T10:49:41.5",
+                        "1999-12-31T23:59:59", "0000-00-00T00:00:00",
+                        "10/09/03", "01/02/99", "31/12/08", "13/13/13",
+                        "Thu Sep 25 10:36:28 BRST 2003", "Mon Jan 05 01:02:03 BRST 1998",
+                        "10h36m28s", "99h99m99s", "3rd of May 2001", "9th of May 2001"]:
+            for kwargs in ({}, {"dayfirst": True}, {"yearfirst": True},
+                           {"dayfirst": True, "yearfirst": True}, {"fuzzy": True}):
+                self.assertSameParse(timestr, **kwargs)
+
+    def test_repeated_strings_and_flags(self):
+        for i in range(3):
+            for kwargs in ({}, {"dayfirst": True}, {"yearfirst": True}, {"fuzzy": True},
+                           {"dayfirst": False, "yearfirst": 1}):
+                self.assertSameParse("10/09/03", **kwargs)
+                self.assertSameParse("today is 25 of September of 2003, 10:49", **kwargs)
+        # each lookup gets its own result
+        first = self.parser._parse("2003-09-25")
+        first.year = 1
+        self.assertEqual(self.parser._parse("2003-09-25").year, 2003)
+
+    def test_percent_and_nul(self):
+        for timestr in ["%", "%s", "%d 2003", "2003%09%25", "10%%20",
+                        "2003-09-25\x00", "20\x0003-09-25", "\x00", "12\x0034",
+                        "12\x0034 10:00", "25 %s 2003 10:49"]:
+            for kwargs in ({}, {"fuzzy": True}):
+                self.assertSameParse(timestr, **kwargs)
+                self.assertSameParse(timestr.replace("2", "7"), **kwargs)
+
+if __name__ == "__main__":
+    unittest.main()
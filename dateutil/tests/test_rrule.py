@@ -0,0 +1,74 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from dateutil.rrule import rrule, rrulebase, WEEKLY, DAILY, HOURLY, MINUTELY, SECONDLY
+
+STEPS = {WEEKLY: 7*86400, DAILY: 86400, HOURLY: 3600, MINUTELY: 60, SECONDLY: 1}
+
+def random_rules(rand, n):
+    for i in range(n):
+        freq = rand.choice(STEPS.keys())
+        interval = rand.randint(1, 5)
+        dtstart = datetime(2009, 1, 1) + timedelta(seconds=rand.randint(0, 86400*30))
+        kwargs = {}
+        limit = rand.randint(0, 2)
+        if limit == 1:
+            kwargs["count"] = rand.randint(1, 50)
+        elif limit == 2:
+            kwargs["until"] = dtstart + timedelta(seconds=STEPS[freq]*interval*rand.randint(0, 50) +
+                                                  rand.randint(0, STEPS[freq]))
+        yield rrule(freq, dtstart=dtstart, interval=interval, **kwargs)
+
+def targets(rand, rule):
+    step = STEPS[rule._freq]*rule._interval
+    start = rule._dtstart
+    yield start
+    yield start - timedelta(seconds=1)
+    for i in range(10):
+        n = rand.randint(-5, 60)
+        on = start + timedelta(seconds=n*step)
+        yield on
+        yield on + timedelta(microseconds=1)
+        yield on - timedelta(seconds=1)
+
+class RruleSeekTest(unittest.TestCase):
+    """ The seek paths of simple rules give what the generator gives """
+
+    def test_simple_rules_seek(self):
+        for freq in STEPS:
+            self.assert_(rrule(freq, dtstart=datetime(2009, 1, 1))._step)
+        self.assertEqual(rrule(DAILY, dtstart=datetime(2009, 1, 1), byhour=(1, 2))._step, None)
+        self.assertEqual(rrule(HOURLY, dtstart=datetime(2009, 1, 1), byweekday=0)._step, None)
+
+    def test_after_and_before(self):
+        rand = random.Random(21)
+        for rule in random_rules(rand, 60):
+            for dt in targets(rand, rule):
+                for inc in (False, True):
+                    self.assertEqual(rule.after(dt, inc), rrulebase.after(rule, dt, inc),
+                                     "%r after %s inc=%s" % (rule.__dict__, dt, inc))
+                    self.assertEqual(rule.before(dt, inc), rrulebase.before(rule, dt, inc),
+                                     "%r before %s inc=%s" % (rule.__dict__, dt, inc))
+
+    def test_between(self):
+        rand = random.Random(23)
+        for rule in random_rules(rand, 60):
+            dts = list(targets(rand, rule))
+            for i in range(5):
+                after, before = sorted(rand.sample(dts, 2))
+                for inc in (False, True):
+                    self.assertEqual(rule.between(after, before, inc),
+                                     rrulebase.between(rule, after, before, inc))
+
+    def test_near_maxyear(self):
+        rule = rrule(WEEKLY, dtstart=datetime(9999, 12, 1))
+        for dt in (datetime(9999, 12, 28), datetime(9999, 12, 29), datetime(9999, 12, 31, 23, 59, 59)):
+            self.assertEqual(rule.after(dt), rrulebase.after(rule, dt))
+            self.assertEqual(rule.before(dt), rrulebase.before(rule, dt))
+        self.assertEqual(rule.after(datetime(9999, 12, 29)), None)
+        self.assertEqual(rule.between(datetime(9999, 12, 1), datetime(9999, 12, 31), inc=True),
+                         list(rule))
+
+if __name__ == "__main__":
+    unittest.main()
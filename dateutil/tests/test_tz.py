@@ -0,0 +1,95 @@
+import unittest
+from datetime import datetime, timedelta
+
+from dateutil.zoneinfo import gettz
+
+ZONES = ["US/Eastern", "Europe/London", "Australia/Lord_Howe", "Asia/Calcutta", "UTC"]
+
+def linear_ttinfo(tz, dt, laststd=0):
+    """ tzfile._find_ttinfo as it was before bisection """
+    timestamp = ((dt - datetime(1970, 1, 1)).days * 86400
+                 + dt.hour * 3600 + dt.minute * 60 + dt.second)
+    idx = 0
+    for trans in tz._trans_list:
+        if timestamp < trans:
+            break
+        idx += 1
+    else:
+        return tz._ttinfo_std
+    if idx == 0:
+        return tz._ttinfo_before
+    if laststd:
+        while idx > 0:
+            tti = tz._trans_idx[idx-1]
+            if not tti.isdst:
+                return tti
+            idx -= 1
+        else:
+            return tz._ttinfo_std
+    else:
+        return tz._trans_idx[idx-1]
+
+def from_timestamp(timestamp):
+    return datetime(1970, 1, 1) + timedelta(seconds=timestamp)
+
+class TzfileTest(unittest.TestCase):
+    def assertMatchesLinear(self, tz, dt):
+        for laststd in (0, 1):
+            self.assert_(tz._find_ttinfo(dt, laststd) is linear_ttinfo(tz, dt, laststd),
+                         "%s at %s (laststd=%s)" % (tz._filename, dt, laststd))
+
+    def test_around_transitions(self):
+        for name in ZONES:
+            tz = gettz(name)
+            for trans in tz._trans_list:
+                for delta in (-3601, -3600, -1, 0, 1, 3599, 3600):
+                    self.assertMatchesLinear(tz, from_timestamp(trans + delta))
+
+    def test_before_first_and_after_last_transition(self):
+        for name in ZONES:
+            tz = gettz(name)
+            self.assertMatchesLinear(tz, datetime(1, 1, 1))
+            self.assertMatchesLinear(tz, datetime(1800, 6, 1))
+            self.assertMatchesLinear(tz, datetime(2100, 6, 1))
+            self.assertMatchesLinear(tz, datetime(9999, 12, 31, 23, 59, 59))
+
+    def test_memoized_hour(self):
+        tz = gettz("US/Eastern")
+        tz._idx_cache.clear()
+        # every few minutes of a week spanning the 2009 spring transition,
+        # twice, so the second pass is answered from the memo
+        start = datetime(2009, 3, 5)
+        for i in range(2):
+            for minute in range(0, 7 * 24 * 60, 7):
+                self.assertMatchesLinear(tz, start + timedelta(minutes=minute))
+        self.assert_(tz._idx_cache)
+
+    def test_hour_with_transition_is_not_memoized(self):
+        for name in ZONES:
+            tz = gettz(name)
+            for trans in tz._trans_list:
+                if trans % 3600:
+                    break
+            else:
+                continue
+            tz._idx_cache.clear()
+            hour = trans // 3600
+            for second in range(0, 3600, 60):
+                self.assertMatchesLinear(tz, from_timestamp(hour * 3600 + second))
+            self.failIf(hour in tz._idx_cache)
+            self.assert_(hour - 1 not in tz._idx_cache)
+            self.assertMatchesLinear(tz, from_timestamp(hour * 3600 - 1))
+            self.assert_(hour - 1 in tz._idx_cache)
+            return
+        self.fail("no transition off the hour in %s" % ZONES)
+
+    def test_memo_is_bounded(self):
+        tz = gettz("Europe/London")
+        tz._idx_cache.clear()
+        for hour in range(3000):
+            dt = datetime(2009, 1, 1) + timedelta(hours=hour)
+            self.assertMatchesLinear(tz, dt)
+        self.assert_(len(tz._idx_cache) <= 1024)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+from datetime import datetime
+
+from dateutil import zoneinfo
+from dateutil.zoneinfo import ZoneStore
+
+class ZoneStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.old_tempdir = tempfile.tempdir
+        tempfile.tempdir = self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        tempfile.tempdir = self.old_tempdir
+        shutil.rmtree(self.tempdir)
+
+    def assertZones(self, store):
+        eastern = store.get("US/Eastern")
+        self.assertEqual(eastern.utcoffset(datetime(2009, 7, 1)).seconds, 20 * 3600)
+        self.assertEqual(eastern.tzname(datetime(2009, 1, 1)), "EST")
+        self.assertEqual(store.get("No/Such_Zone"), None)
+
+    def test_mapped(self):
+        store = ZoneStore(zoneinfo.ZONEINFOFILE)
+        self.assertZones(store)
+        if zoneinfo.mmap is not None:
+            self.failIf(isinstance(store.data, str))
+            self.assertEqual(os.stat(store._private_dir()).st_mode & 0777, 0700)
+        # a second store uses the same uncompressed tar
+        self.assertZones(ZoneStore(zoneinfo.ZONEINFOFILE))
+
+    def test_planted_file_is_replaced(self):
+        store = ZoneStore(zoneinfo.ZONEINFOFILE)
+        unpacked = store._unpacked_filename()
+        for planted in ("", "not a tar"):
+            open(unpacked, "wb").write(planted)
+            store = ZoneStore(zoneinfo.ZONEINFOFILE)
+            self.assertZones(store)
+            self.assertEqual(os.path.getsize(unpacked), store._uncompressed_size())
+
+    def test_shared_directory_falls_back_to_memory(self):
+        store = ZoneStore(zoneinfo.ZONEINFOFILE)
+        if not hasattr(os, "getuid"):
+            return
+        os.chmod(store._private_dir(), 0777)
+        self.assertRaises(OSError, store._private_dir)
+        self.assertZones(store)
+        self.assert_(isinstance(store.data, str))
+
+    def test_rebuilt_bz2_tarball(self):
+        if os.system("zic --version > %s 2>&1" % os.devnull):
+            return
+        source = os.path.join(self.tempdir, "tzdata.tar")
+        rules = os.path.join(self.tempdir, "testzones")
+        open(rules, "w").write("Zone\tTest/Zone\t-5:00\t-\tTST\n")
+        tf = tarfile.open(source, "w")
+        tf.add(rules, "testzones")
+        tf.close()
+        moduledir = os.path.join(self.tempdir, "module")
+        os.mkdir(moduledir)
+        module_file = zoneinfo.__file__
+        zoneinfo.__file__ = os.path.join(moduledir, "__init__.py")
+        try:
+            zoneinfo.rebuild(source, tag="test", format="bz2")
+        finally:
+            zoneinfo.__file__ = module_file
+        store = ZoneStore(os.path.join(moduledir, "zoneinfo-test.tar.bz2"))
+        zone = store.get("Test/Zone")
+        self.assertEqual(zone.utcoffset(datetime(2009, 7, 1)).days, -1)
+        self.assertEqual(zone.utcoffset(datetime(2009, 7, 1)).seconds, 19 * 3600)
+        self.assertEqual(store.get("No/Such_Zone"), None)
+
+    def test_unsupported_format(self):
+        filename = os.path.join(self.tempdir, "zoneinfo.tar.xz")
+        open(filename, "wb").write("\xfd7zXZ\x00")
+        self.assertRaises(ValueError, ZoneStore(filename).get, "US/Eastern")
+
+if __name__ == "__main__":
+    unittest.main()
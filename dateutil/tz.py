@@ -12,6 +12,7 @@ import struct
 import time
 import sys
 import os
+from bisect import bisect_right
 
 relativedelta = None
 parser = None
@@ -399,17 +400,34 @@ class tzfile(datetime.tzinfo):
                 self._trans_list[i] += laststdoffset
         self._trans_list = tuple(self._trans_list)
 
+        # Hour -> transition index, for the hours with no transition.
+        self._idx_cache = {}
+
+    def _find_idx(self, timestamp):
+        # Number of transitions at or before timestamp. Most lookups
+        # fall in an hour seen before, and an hour without a
+        # transition in it maps to a single index.
+        hour = timestamp // 3600
+        try:
+            return self._idx_cache[hour]
+        except KeyError:
+            pass
+        idx = bisect_right(self._trans_list, timestamp)
+        start = hour * 3600
+        if (bisect_right(self._trans_list, start) ==
+                bisect_right(self._trans_list, start + 3599)):
+            if len(self._idx_cache) >= 1024:
+                self._idx_cache.clear()
+            self._idx_cache[hour] = idx
+        return idx
+
     def _find_ttinfo(self, dt, laststd=0):
         timestamp = ((dt.toordinal() - EPOCHORDINAL) * 86400
                      + dt.hour * 3600
                      + dt.minute * 60
                      + dt.second)
-        idx = 0
-        for trans in self._trans_list:
-            if timestamp < trans:
-                break
-            idx += 1
-        else:
+        idx = self._find_idx(timestamp)
+        if idx == len(self._trans_list):
             return self._ttinfo_std
         if idx == 0:
             return self._ttinfo_before
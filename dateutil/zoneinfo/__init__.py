@@ -5,15 +5,25 @@ This module offers extensions to the standard python 2.3+
 datetime module.
 """
 from dateutil.tz import tzfile
+from dateutil._cache import LRUCache
 from tarfile import TarFile
+import tempfile
+import threading
+import struct
+import gzip
+import stat
 import os
 
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
 __author__ = "Gustavo Niemeyer <gustavo@niemeyer.net>"
 __license__ = "PSF License"
 
 __all__ = ["setcachesize", "gettz", "rebuild"]
 
-CACHE = []
 CACHESIZE = 10
 
 class tzfile(tzfile):
@@ -33,28 +43,232 @@ ZONEINFOFILE = getzoneinfofile()
 
 del getzoneinfofile
 
+class _ZoneData(object):
+    """
+    A read-only file over one zone's bytes in the store, as tzfile wants.
+    """
+
+    def __init__(self, name, data, offset, size):
+        self.name = name
+        self._data = data
+        self._pos = offset
+        self._end = offset + size
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self._end - self._pos
+        start = self._pos
+        self._pos = min(start + size, self._end)
+        return self._data[start:self._pos]
+
+class ZoneStore(object):
+    """
+    The zones of a compressed zoneinfo tarball, indexed once.
+
+    The tarball is uncompressed to a plain tar in a directory of the
+    temporary directory that only this user can write to (done once per
+    tarball, not per process) which is memory-mapped, and the offset and
+    size of every zone in it are indexed. Loading a zone then reads only
+    its own bytes. A tar of the wrong size is written again. Without a
+    private temporary directory or mmap, the uncompressed tar is kept in
+    memory instead.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.data = None
+        self.index = None
+        self._lock = threading.Lock()
+
+    def _private_dir(self):
+        """
+        Returns a directory in the temporary directory that belongs to this
+        user and that nobody else can write to, creating it if need be.
+        """
+        if hasattr(os, "getuid"):
+            uid = owner = os.getuid()
+        else:
+            # per-user temporary directories, no ownership to check
+            import getpass
+            uid, owner = None, getpass.getuser()
+        dirname = os.path.join(tempfile.gettempdir(), "dateutil-%s" % owner)
+        try:
+            os.mkdir(dirname, 0700)
+        except OSError:
+            pass
+        dirstat = os.lstat(dirname)
+        if not stat.S_ISDIR(dirstat.st_mode):
+            raise OSError("%s is not a directory" % dirname)
+        if uid is not None and (dirstat.st_uid != uid or dirstat.st_mode & 077):
+            raise OSError("%s is not private to this user" % dirname)
+        return dirname
+
+    def _unpacked_filename(self):
+        filestat = os.stat(self.filename)
+        name = "%s-%d-%d.tar" % (os.path.basename(self.filename).split(".tar.")[0],
+                                 filestat.st_size, int(filestat.st_mtime))
+        return os.path.join(self._private_dir(), name)
+
+    def _compression(self):
+        # rebuild() writes gzip or bzip2 tarballs
+        fileobj = open(self.filename, "rb")
+        try:
+            magic = fileobj.read(3)
+        finally:
+            fileobj.close()
+        if magic.startswith("\x1f\x8b"):
+            return "gz"
+        elif magic == "BZh":
+            return "bz2"
+        raise ValueError("%s is not a gzip or bzip2 compressed tarball" % self.filename)
+
+    def _uncompressed_size(self):
+        # gzip ends with the uncompressed size, modulo 2**32; bzip2
+        # doesn't record it
+        if self._compression() != "gz":
+            return None
+        fileobj = open(self.filename, "rb")
+        try:
+            fileobj.seek(-4, 2)
+            return struct.unpack("<I", fileobj.read(4))[0]
+        finally:
+            fileobj.close()
+
+    def _uncompressed(self):
+        if self._compression() == "bz2":
+            import bz2
+            fileobj = bz2.BZ2File(self.filename, "rb")
+        else:
+            fileobj = gzip.open(self.filename, "rb")
+        try:
+            return fileobj.read()
+        finally:
+            fileobj.close()
+
+    def _open(self):
+        """
+        Returns the uncompressed tar (memory-mapped if possible) and a file
+        object to read its headers from.
+        """
+        if mmap is not None:
+            try:
+                fileobj = self._open_unpacked()
+                try:
+                    return mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ), fileobj
+                except:
+                    fileobj.close()
+                    raise
+            except (EnvironmentError, ValueError):
+                pass
+        from cStringIO import StringIO
+        data = self._uncompressed()
+        return data, StringIO(data)
+
+    def _open_unpacked(self):
+        """
+        Opens the uncompressed tar in the private directory, writing it
+        first if it's missing, empty or isn't the size the tarball says it
+        is.
+        """
+        unpacked = self._unpacked_filename()
+        size = self._uncompressed_size()
+        try:
+            fileobj = open(unpacked, "rb")
+        except IOError:
+            pass
+        else:
+            filestat = os.fstat(fileobj.fileno())
+            if (stat.S_ISREG(filestat.st_mode) and filestat.st_size and
+                    (size is None or filestat.st_size % 2**32 == size)):
+                return fileobj
+            fileobj.close()
+        fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(unpacked))
+        try:
+            try:
+                os.write(fd, self._uncompressed())
+            finally:
+                os.close(fd)
+            os.rename(tmpname, unpacked)
+        except:
+            if os.path.exists(tmpname):
+                os.unlink(tmpname)
+            raise
+        return open(unpacked, "rb")
+
+    def _build_index(self, fileobj):
+        index = {}
+        links = []
+        tf = TarFile.open(fileobj=fileobj)
+        for member in tf.getmembers():
+            if member.isfile():
+                index[member.name] = (member.offset_data, member.size)
+            elif member.islnk() or member.issym():
+                links.append(member)
+        tf.close()
+        for member in links:
+            if member.issym():
+                target = os.path.normpath(os.path.join(os.path.dirname(member.name),
+                                                       member.linkname))
+            else:
+                target = member.linkname
+            if target in index:
+                index[member.name] = index[target]
+        return index
+
+    def load(self):
+        self._lock.acquire()
+        try:
+            if self.index is None:
+                data, fileobj = self._open()
+                try:
+                    self.index = self._build_index(fileobj)
+                finally:
+                    fileobj.close()
+                self.data = data
+        finally:
+            self._lock.release()
+
+    def get(self, name):
+        """
+        Returns the zone ``name`` as a tzfile, or None if there is no such
+        zone in the tarball.
+        """
+        if self.index is None:
+            self.load()
+        try:
+            offset, size = self.index[name]
+        except KeyError:
+            return None
+        return tzfile(_ZoneData(name, self.data, offset, size))
+
+STORE = ZONEINFOFILE and ZoneStore(ZONEINFOFILE)
+CACHE = LRUCache(CACHESIZE)
+_cache_lock = threading.Lock()
+
 def setcachesize(size):
-    global CACHESIZE, CACHE
+    global CACHESIZE
     CACHESIZE = size
-    del CACHE[size:]
+    _cache_lock.acquire()
+    try:
+        CACHE.resize(size)
+    finally:
+        _cache_lock.release()
 
 def gettz(name):
     tzinfo = None
-    if ZONEINFOFILE:
-        for cachedname, tzinfo in CACHE:
-            if cachedname == name:
-                break
-        else:
-            tf = TarFile.open(ZONEINFOFILE)
-            try:
-                zonefile = tf.extractfile(name)
-            except KeyError:
-                tzinfo = None
-            else:
-                tzinfo = tzfile(zonefile)
-            tf.close()
-            CACHE.insert(0, (name, tzinfo))
-            del CACHE[CACHESIZE:]
+    if STORE:
+        _cache_lock.acquire()
+        try:
+            if name in CACHE:
+                return CACHE.get(name)
+        finally:
+            _cache_lock.release()
+        tzinfo = STORE.get(name)
+        _cache_lock.acquire()
+        try:
+            CACHE.set(name, tzinfo)
+        finally:
+            _cache_lock.release()
     return tzinfo
 
 def rebuild(filename, tag=None, format="gz"):
@@ -31,8 +31,10 @@ class JobAdmin(admin.ModelAdmin):
             job = Job.objects.get(pk=pk)
         except Job.DoesNotExist:
             raise Http404
-        job.run(save=False)
-        request.user.message_set.create(message=_('The job "%(job)s" was run successfully.') % {'job': job})        
+        if job.run(save=False):
+            request.user.message_set.create(message=_('The job "%(job)s" was run successfully.') % {'job': job})        
+        else:
+            request.user.message_set.create(message=_('The job "%(job)s" failed; see its log.') % {'job': job})
         return HttpResponseRedirect(request.path + "../")
     
     def get_urls(self):
@@ -1,9 +1,45 @@
+import threading
+from Queue import Queue, Empty
+from optparse import make_option
+
 from django.core.management.base import BaseCommand
 
+from django_chronograph.scheduler import WORKERS, JOB_TIMEOUT
+
 class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', action='store', dest='workers', type='int', default=WORKERS,
+            help='Number of jobs to run at the same time (default: CHRONOGRAPH_WORKERS).'),
+        make_option('--timeout', action='store', dest='timeout', type='int', default=JOB_TIMEOUT,
+            help='Kill jobs that run for longer than this many seconds (default: CHRONOGRAPH_JOB_TIMEOUT).'),
+    )
     help = 'Runs all jobs that are due.'
     
     def handle(self, *args, **options):
         from django_chronograph.models import Job
+        jobs = Queue()
         for job in Job.objects.due():
-            job.run()
\ No newline at end of file
+            jobs.put(job)
+        run_jobs(jobs, options['workers'], options['timeout'])
+
+def run_jobs(jobs, workers, timeout):
+    """
+    Runs the jobs in the ``Queue`` ``jobs`` with ``workers`` threads. Each
+    job runs in its own child process, so the threads just wait on them.
+    """
+    from django.db import connection
+    def work():
+        try:
+            while True:
+                try:
+                    job = jobs.get_nowait()
+                except Empty:
+                    return
+                job.run(timeout=timeout)
+        finally:
+            connection.close()
+    threads = [threading.Thread(target=work) for i in range(min(max(workers, 1), jobs.qsize()))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,21 @@
+import logging
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from django_chronograph.scheduler import Scheduler, WORKERS, JOB_TIMEOUT, RELOAD_INTERVAL
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', action='store', dest='workers', type='int', default=WORKERS,
+            help='Number of jobs to run at the same time (default: CHRONOGRAPH_WORKERS).'),
+        make_option('--timeout', action='store', dest='timeout', type='int', default=JOB_TIMEOUT,
+            help='Kill jobs that run for longer than this many seconds (default: CHRONOGRAPH_JOB_TIMEOUT).'),
+        make_option('--reload-interval', action='store', dest='reload_interval', type='int', default=RELOAD_INTERVAL,
+            help='Seconds between checks for new or changed jobs (default: CHRONOGRAPH_RELOAD_INTERVAL).'),
+    )
+    help = 'Runs jobs as they become due, until interrupted. Replaces running "cron" from the system crontab.'
+    
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+        Scheduler(options['workers'], options['timeout'], options['reload_interval']).run_forever()
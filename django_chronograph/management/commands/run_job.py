@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = 'Runs the command of a job in this process. Used by Job.run.'
+    args = '<command> [arg option=value ...]'
+    
+    def handle(self, *args, **options):
+        from django.core.management import call_command
+        from django_chronograph.models import parse_args
+        if not args:
+            raise CommandError("Expected a command to run")
+        job_args, job_options = parse_args(" ".join(args[1:]))
+        call_command(args[0], *job_args, **job_options)
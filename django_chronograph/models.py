@@ -5,14 +5,65 @@ from django.conf import settings
 
 import os
 import sys
+import signal
+import threading
+import traceback
+import subprocess
 from datetime import datetime
 from dateutil import rrule
 from StringIO import StringIO
 
+# compiled rrules and parsed params are kept for this many different
+# schedules before the caches are emptied
+RRULE_CACHE_SIZE = getattr(settings, "CHRONOGRAPH_RRULE_CACHE_SIZE", 256)
+_rrule_cache = {}
+_params_cache = {}
+
+# scheduled jobs are run in a child process so their output can be
+# captured, and the child killed if it runs for longer than the timeout.
+# jobs run from the admin stay in-process, as under mod_wsgi
+# sys.executable isn't a python interpreter
+RUNNER = "from django.core.management import execute_from_command_line; execute_from_command_line()"
+
+def parse_args(args):
+    """
+    Splits a job's args into a tuple of (args, options) for passing to ``call_command``.
+    """
+    positional = []
+    options = {}
+    for arg in args.split():
+        if arg.find('=') > -1:
+            bits = arg.split('=')
+            options[bits[0]] = bits[1]
+        else:
+            positional.append(arg)
+    return (positional, options)
+
+def settings_location():
+    """
+    Returns the name of the settings module and the directory it's imported
+    from. ``manage.py`` takes that directory back off ``sys.path`` once the
+    settings are imported, so a child process has to be given it.
+    """
+    name = settings.SETTINGS_MODULE
+    path = os.path.abspath(sys.modules[name].__file__)
+    if os.path.splitext(os.path.basename(path))[0] == "__init__":
+        path = os.path.dirname(path)
+    for part in name.split("."):
+        path = os.path.dirname(path)
+    return name, path
+
 class JobManager(models.Manager):
+    def changed_since(self, when):
+        """
+        Returns a ``QuerySet`` of the jobs saved or run at or after ``when``.
+        """
+        return self.filter(updated_on__gte=when)
+    
     def due(self):
         """
-        Returns a ``QuerySet`` of all jobs waiting to be run.
+        Returns a ``QuerySet`` of all jobs waiting to be run. This is served
+        by the index on ``(disabled, next_run)`` added by migration 007.
         """
         return self.filter(next_run__lte=datetime.now(), disabled=False)
 
@@ -24,6 +75,7 @@ freqs = (   ("YEARLY", _("Yearly")),
             ("HOURLY", _("Hourly")),
             ("MINUTELY", _("Minutely")),
             ("SECONDLY", _("Secondly")))
+frequencies = dict([(name, getattr(rrule, name)) for name, label in freqs])
 
 class Job(models.Model):
     """
@@ -40,6 +92,7 @@ class Job(models.Model):
     disabled = models.BooleanField(default=False, help_text=_('If checked this job will never run.'))
     next_run = models.DateTimeField(_("next run"), blank=True, null=True, help_text=_("If you don't set this it will be determined automatically"))
     last_run = models.DateTimeField(_("last run"), editable=False, blank=True, null=True)
+    updated_on = models.DateTimeField(_("updated on"), editable=False, auto_now=True, db_index=True)
     
     objects = JobManager()
     
@@ -51,16 +104,24 @@ class Job(models.Model):
             return _(u"%(name)s - disabled") % {'name': self.name}
         return u"%s - %s" % (self.name, self.timeuntil)
     
+    def __init__(self, *args, **kwargs):
+        super(Job, self).__init__(*args, **kwargs)
+        self._saved_schedule = (self.frequency, self.params, self.next_run)
+    
     def save(self, force_insert=False, force_update=False):
         if not self.disabled:
             if not self.last_run:
                 self.last_run = datetime.now()
-            if not self.next_run:
+            frequency, params, next_run = self._saved_schedule
+            rule_changed = (self.frequency, self.params) != (frequency, params) and self.next_run == next_run
+            if not self.next_run or rule_changed:
+                # worked out once here so ``due()`` is a plain index lookup
                 self.next_run = self.rrule.after(self.last_run)
         else:
             self.next_run = None
         
         super(Job, self).save(force_insert, force_update)
+        self._saved_schedule = (self.frequency, self.params, self.next_run)
 
     def get_timeuntil(self):
         """
@@ -85,10 +146,18 @@ class Job(models.Model):
     
     def get_rrule(self):
         """
-        Returns the rrule objects for this Job.
+        Returns the rrule objects for this Job. They are cached for as long
+        as the frequency, params and last run stay the same.
         """
-        frequency = eval('rrule.%s' % self.frequency)
-        return rrule.rrule(frequency, dtstart=self.last_run, **self.get_params())
+        key = (self.frequency, self.params, self.last_run)
+        try:
+            return _rrule_cache[key]
+        except KeyError:
+            pass
+        if len(_rrule_cache) >= RRULE_CACHE_SIZE:
+            _rrule_cache.clear()
+        _rrule_cache[key] = rrule.rrule(frequencies[self.frequency], dtstart=self.last_run, **self.get_params())
+        return _rrule_cache[key]
     rrule = property(get_rrule)
     
     def get_params(self):
@@ -99,6 +168,8 @@ class Job(models.Model):
         """
         if self.params is None:
             return {}
+        if self.params in _params_cache:
+            return dict(_params_cache[self.params])
         params = self.params.split(';')
         param_dict = []
         for param in params:
@@ -108,28 +179,39 @@ class Job(models.Model):
                 if len(param[1]) == 1:
                     param = (param[0], param[1][0])
                 param_dict.append(param)
+        if len(_params_cache) >= RRULE_CACHE_SIZE:
+            _params_cache.clear()
+        _params_cache[self.params] = dict(param_dict)
         return dict(param_dict)
     
     def get_args(self):
         """
         Processes the args and returns a tuple or (args, options) for passing to ``call_command``.
         """
-        args = []
-        options = {}
-        for arg in self.args.split():
-            if arg.find('=') > -1:
-                bits = arg.split('=')
-                options[bits[0]] = bits[1]
-            else:
-                args.append(arg)
-        return (args, options)
+        return parse_args(self.args)
     
-    def run(self, save=True):
+    def claim(self, run_date):
         """
-        Runs this ``Job``.  If ``save`` is ``True`` the dates (``last_run`` and ``next_run``)
-        are updated.  If ``save`` is ``False`` the job simply gets run and nothing changes.
-        
-        A ``Log`` will be created if there is any output from either stdout or stderr.
+        Marks this ``Job`` as run at ``run_date`` and moves ``next_run`` on.
+        The ``UPDATE`` only matches while ``next_run`` is still the value
+        this instance read, so when two ``cron`` invocations pick up the
+        same job only one of them gets it; returns whether this one did.
+        """
+        last_run, self.last_run = self.last_run, run_date
+        next_run = self.rrule.after(run_date)
+        claimed = Job.objects.filter(pk=self.pk, next_run=self.next_run).update(last_run=run_date, next_run=next_run, updated_on=datetime.now())
+        if not claimed:
+            self.last_run = last_run
+            return False
+        self.next_run = next_run
+        self._saved_schedule = (self.frequency, self.params, self.next_run)
+        return True
+    
+    def call(self):
+        """
+        Runs the command in this process and returns its ``(stdout, stderr,
+        returncode)``. An exception raised by the command is written to
+        stderr and gives a return code of 1.
         """
         from django.core.management import call_command
         
@@ -142,18 +224,71 @@ class Job(models.Model):
         ostderr = sys.stderr
         sys.stdout = stdout
         sys.stderr = stderr
+        returncode = 0
+        try:
+            try:
+                call_command(self.command, *args, **options)
+            except (Exception, SystemExit):
+                traceback.print_exc(file=stderr)
+                returncode = 1
+        finally:
+            # Redirect output back to default
+            sys.stdout = ostdout
+            sys.stderr = ostderr
+        return stdout.getvalue(), stderr.getvalue(), returncode
+    
+    def execute(self, timeout=None):
+        """
+        Runs the command in a child process and returns its ``(stdout,
+        stderr, returncode)``. A child still running after ``timeout``
+        seconds is killed.
+        """
+        settings_module, settings_path = settings_location()
+        env = dict(os.environ)
+        env["DJANGO_SETTINGS_MODULE"] = settings_module
+        env["PYTHONPATH"] = os.pathsep.join([settings_path] + sys.path)
+        process = subprocess.Popen([sys.executable, "-c", RUNNER, "run_job", self.command] + self.args.split(),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        killed = []
+        def kill():
+            killed.append(True)
+            # Popen.kill() is new in python 2.6
+            os.kill(process.pid, signal.SIGKILL)
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, kill)
+            timer.start()
+        try:
+            stdout, stderr = process.communicate()
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if killed:
+            stderr += "\nKilled after running for %s seconds.\n" % timeout
+        elif process.returncode:
+            stderr += "\nExited with status %s.\n" % process.returncode
+        return stdout, stderr, process.returncode
+    
+    def run(self, save=True, timeout=None):
+        """
+        Runs this ``Job``.  If ``save`` is ``True`` the dates (``last_run`` and ``next_run``)
+        are updated, unless another process has already started this run, in which case
+        nothing happens.  If ``save`` is ``False`` the job simply gets run and nothing changes.
         
+        When saving, the command runs in a child process, which is killed after ``timeout``
+        seconds; otherwise it runs in this process.  A ``Log`` will be created if there is
+        any output from either stdout or stderr, which includes a failure or a timeout.
+        Returns whether the job was run and succeeded.
+        """
         run_date = datetime.now()
-        call_command(self.command, *args, **options)
-        
         if save:
-            self.last_run = run_date
-            self.next_run = self.rrule.after(run_date)
-            self.save()
+            if not self.claim(run_date):
+                return False
+            stdout, stderr, returncode = self.execute(timeout)
+        else:
+            stdout, stderr, returncode = self.call()
         
         # If we got any output, save it to the log
-        stdout = stdout.getvalue()
-        stderr = stderr.getvalue()
         if stdout or stderr:
             log = Log.objects.create(
                 job = self,
@@ -161,10 +296,7 @@ class Job(models.Model):
                 stdout = stdout,
                 stderr = stderr
             )
-        
-        # Redirect output back to default
-        sys.stdout = ostdout
-        sys.stderr = ostderr
+        return returncode == 0
             
 
 class Log(models.Model):
@@ -0,0 +1,144 @@
+"""
+A resident scheduler for the jobs, run with ``manage.py cron_daemon``.
+
+It keeps a min-heap of ``(next_run, job id)`` and sleeps until the first
+entry is due, so nothing happens while no job is due. Jobs added or edited
+in the admin are picked up by asking only for the jobs updated since the
+last check, every ``CHRONOGRAPH_RELOAD_INTERVAL`` seconds. Due jobs are
+handed to a pool of worker threads, which run them just like ``cron`` does.
+"""
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from Queue import Queue, Empty
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from django_chronograph.models import Job
+
+# how many jobs run at the same time, and how long (in seconds) one may run
+# before it is killed; None lets jobs run for as long as they take
+WORKERS = getattr(settings, "CHRONOGRAPH_WORKERS", 4)
+JOB_TIMEOUT = getattr(settings, "CHRONOGRAPH_JOB_TIMEOUT", None)
+
+# how often (in seconds) the scheduler looks for new or changed jobs
+RELOAD_INTERVAL = getattr(settings, "CHRONOGRAPH_RELOAD_INTERVAL", 60)
+
+def seconds(delta):
+    return delta.days * 24 * 60 * 60 + delta.seconds + delta.microseconds / 1000000.0
+
+class Scheduler(object):
+    def __init__(self, workers=WORKERS, timeout=JOB_TIMEOUT, reload_interval=RELOAD_INTERVAL):
+        self.workers = workers
+        self.timeout = timeout
+        self.reload_interval = reload_interval
+        self.jobs = {}
+        self.heap = []
+        self.watermark = None
+        self.running = set()
+        self.pending = Queue()
+        self.finished = Queue()
+    
+    def schedule(self, job):
+        """
+        Adds or replaces ``job``. Entries for an older ``next_run`` stay in
+        the heap and are skipped when they come up.
+        """
+        if job.disabled or job.next_run is None:
+            self.jobs.pop(job.pk, None)
+            return
+        old = self.jobs.get(job.pk)
+        self.jobs[job.pk] = job
+        if old is None or old.next_run != job.next_run:
+            heapq.heappush(self.heap, (job.next_run, job.pk))
+    
+    def reload(self):
+        """
+        Reads the jobs changed since the last reload (all of them the first
+        time) and returns how many there were
+        """
+        # end the current transaction, or MySQL keeps reading the same snapshot
+        transaction.commit_unless_managed()
+        now = datetime.now()
+        if self.watermark is None:
+            jobs = Job.objects.all()
+        else:
+            jobs = Job.objects.changed_since(self.watermark)
+        count = 0
+        for job in jobs:
+            count += 1
+            if job.pk not in self.running:
+                self.schedule(job)
+        # updated_on may only be stored to the second, so look back a little
+        self.watermark = now - timedelta(seconds=1)
+        return count
+    
+    def pop_due(self, now):
+        """
+        Returns the jobs due at ``now`` and removes them from the heap
+        """
+        due = {}
+        while self.heap and self.heap[0][0] <= now:
+            next_run, pk = heapq.heappop(self.heap)
+            job = self.jobs.get(pk)
+            if job is None or job.next_run != next_run or pk in self.running:
+                continue
+            due[pk] = job
+        return due.values()
+    
+    def work(self):
+        while True:
+            job = self.pending.get()
+            try:
+                try:
+                    job.run(timeout=self.timeout)
+                except Exception:
+                    logging.exception("running %s failed" % job.name)
+            finally:
+                # read the job again: it may have been edited or deleted
+                # meanwhile, or already run by ``cron``
+                try:
+                    self.finished.put((job.pk, Job.objects.get(pk=job.pk)))
+                except Exception:
+                    self.finished.put((job.pk, None))
+                connection.close()
+    
+    def start_workers(self):
+        for i in range(max(self.workers, 1)):
+            thread = threading.Thread(target=self.work)
+            thread.setDaemon(True)
+            thread.start()
+    
+    def run_forever(self):
+        self.start_workers()
+        self.reload()
+        next_reload = datetime.now() + timedelta(seconds=self.reload_interval)
+        while True:
+            now = datetime.now()
+            if now >= next_reload:
+                self.reload()
+                next_reload = now + timedelta(seconds=self.reload_interval)
+            for job in self.pop_due(now):
+                logging.info("running %s" % job.name)
+                self.running.add(job.pk)
+                self.pending.put(job)
+            
+            wake_at = next_reload
+            if self.heap and self.heap[0][0] < wake_at:
+                wake_at = self.heap[0][0]
+            # a finished job wakes us up early to schedule its next run
+            try:
+                pk, job = self.finished.get(timeout=max(seconds(wake_at - datetime.now()), 0))
+            except Empty:
+                continue
+            while True:
+                self.running.discard(pk)
+                self.jobs.pop(pk, None)
+                if job is not None:
+                    self.schedule(job)
+                try:
+                    pk, job = self.finished.get_nowait()
+                except Empty:
+                    break
@@ -5,8 +5,13 @@ unittest). These will both pass when you run "manage.py test".
 Replace these with more appropriate tests for your application.
 """
 
+from datetime import datetime, timedelta
+
 from django.test import TestCase
 
+from django_chronograph.models import Job, Log
+from django_chronograph.scheduler import Scheduler
+
 class SimpleTest(TestCase):
     def test_basic_addition(self):
         """
@@ -14,6 +19,91 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+class JobScheduleTest(TestCase):
+    def test_rrule_is_cached(self):
+        job = Job(name="test", frequency="MINUTELY", params="interval:5", command="send_mail",
+                  last_run=datetime(2009, 1, 1, 12, 0))
+        self.assert_(job.rrule is job.rrule)
+        self.assertEqual(job.rrule.after(job.last_run), datetime(2009, 1, 1, 12, 5))
+        job.last_run = datetime(2009, 1, 1, 13, 0)
+        self.assertEqual(job.rrule.after(job.last_run), datetime(2009, 1, 1, 13, 5))
+
+    def test_long_lived_job(self):
+        # seeks to the next occurrence instead of generating nine years of seconds
+        job = Job(name="test", frequency="SECONDLY", command="send_mail", last_run=datetime(2000, 1, 1))
+        self.assertEqual(job.rrule.after(datetime(2009, 1, 1, 0, 0, 0, 5)), datetime(2009, 1, 1, 0, 0, 1))
+
+    def test_next_run_follows_schedule_changes(self):
+        job = Job.objects.create(name="test", frequency="MINUTELY", params="interval:5", command="send_mail",
+                                 last_run=datetime(2009, 1, 1, 12, 0))
+        self.assertEqual(job.next_run, datetime(2009, 1, 1, 12, 5))
+        job = Job.objects.get(pk=job.pk)
+        job.frequency = "HOURLY"
+        job.save()
+        self.assertEqual(Job.objects.get(pk=job.pk).next_run, datetime(2009, 1, 1, 17, 0))
+        self.assertEqual(list(Job.objects.due()), [job])
+
+    def test_only_one_claim_wins(self):
+        Job.objects.create(name="test", frequency="MINUTELY", params="interval:5", command="send_mail",
+                           last_run=datetime(2009, 1, 1, 12, 0))
+        first, second = Job.objects.due()[0], Job.objects.due()[0]
+        self.assert_(first.claim(datetime(2009, 1, 1, 12, 6)))
+        self.failIf(second.claim(datetime(2009, 1, 1, 12, 6)))
+        job = Job.objects.get()
+        self.assertEqual(job.last_run, datetime(2009, 1, 1, 12, 6))
+        self.assertEqual(job.next_run, datetime(2009, 1, 1, 12, 11))
+        self.assertEqual(list(Job.objects.due()), [])
+
+class JobRunTest(TestCase):
+    def setUp(self):
+        self.job = Job.objects.create(name="test", frequency="MINUTELY", params="interval:5",
+                                      command="no_such_command", last_run=datetime(2009, 1, 1, 12, 0))
+
+    def test_failure_in_process(self):
+        self.failIf(self.job.run(save=False))
+        self.assert_("Unknown command" in Log.objects.get(job=self.job).stderr)
+        self.assertEqual(Job.objects.get().last_run, datetime(2009, 1, 1, 12, 0))
+
+    def test_failure_in_child(self):
+        self.job.execute = lambda timeout: ("", "\nExited with status 1.\n", 1)
+        self.failIf(self.job.run())
+        self.assertEqual(Log.objects.get(job=self.job).stderr, "\nExited with status 1.\n")
+        # the run was claimed, so it isn't retried until the next one is due
+        self.assertEqual(Job.objects.due().count(), 0)
+
+class JobExecuteTest(TestCase):
+    """ Runs commands in a real child process """
+    def test_command_runs(self):
+        job = Job(name="test", frequency="DAILY", command="diffsettings")
+        stdout, stderr, returncode = job.execute(timeout=60)
+        self.assertEqual(returncode, 0, stderr)
+        self.assert_("INSTALLED_APPS" in stdout)
+
+    def test_failure_is_reported(self):
+        job = Job(name="test", frequency="DAILY", command="no_such_command", args="one option=two")
+        stdout, stderr, returncode = job.execute(timeout=60)
+        self.assertEqual(returncode, 1)
+        self.assert_("Unknown command" in stderr)
+        self.assert_("Exited with status 1." in stderr)
+
+class SchedulerTest(TestCase):
+    def test_reload_and_pop_due(self):
+        job = Job.objects.create(name="test", frequency="MINUTELY", params="interval:5", command="send_mail",
+                                 last_run=datetime(2009, 1, 1, 12, 0))
+        scheduler = Scheduler()
+        self.assertEqual(scheduler.reload(), 1)
+        self.assertEqual(scheduler.pop_due(datetime(2009, 1, 1, 12, 4)), [])
+        self.assertEqual(scheduler.pop_due(datetime(2009, 1, 1, 12, 5)), [job])
+        self.assertEqual(scheduler.pop_due(datetime(2009, 1, 1, 12, 5)), [])
+        
+        # only jobs changed since the last reload are read again
+        Job.objects.update(updated_on=datetime.now() - timedelta(hours=1))
+        self.assertEqual(scheduler.reload(), 0)
+        job.next_run = datetime(2009, 1, 1, 13, 0)
+        job.save()
+        self.assertEqual(scheduler.reload(), 1)
+        self.assertEqual(scheduler.pop_due(datetime(2009, 1, 1, 13, 0)), [job])
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
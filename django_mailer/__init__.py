@@ -16,6 +16,8 @@ PRIORITY_MAPPING = {
 }
 
 # replacement for django.core.mail.send_mail
+# each of these queues the message for all its recipients with one bulk
+# insert and returns the number of messages queued
 
 def send_mail(subject, message, from_email, recipient_list, priority="medium",
               fail_silently=False, auth_user=None, auth_password=None):
@@ -24,12 +26,8 @@ def send_mail(subject, message, from_email, recipient_list, priority="medium",
     # need to do this in case subject used lazy version of ugettext
     subject = force_unicode(subject)
     priority = PRIORITY_MAPPING[priority]
-    for to_address in recipient_list:
-        Message(to_address=to_address,
-                from_address=from_email,
-                subject=subject,
-                message_body=message,
-                priority=priority).save()
+    return Message.objects.enqueue(recipient_list, from_email, subject, message,
+                                   priority=priority)
 
 def send_html_mail(subject, message, message_html, from_email, recipient_list, 
                     priority="medium", fail_silently=False, auth_user=None,
@@ -42,34 +40,25 @@ def send_html_mail(subject, message, message_html, from_email, recipient_list,
     # need to do this in case subject used lazy version of ugettext
     subject = force_unicode(subject)
     priority = PRIORITY_MAPPING[priority]
-    for to_address in recipient_list:
-        Message(to_address = to_address,
-            from_address = from_email,
-            subject = subject,
-            message_body = message,
-            message_body_html = message_html,
-            priority=priority).save()
+    return Message.objects.enqueue(recipient_list, from_email, subject, message,
+                                   message_html, priority=priority)
 
 def mail_admins(subject, message, fail_silently=False, priority="medium"):
     from django.utils.encoding import force_unicode
     from django.conf import settings
     from django_mailer.models import Message
     priority = PRIORITY_MAPPING[priority]
-    for name, to_address in settings.ADMINS:
-        Message(to_address=to_address,
-                from_address=settings.SERVER_EMAIL,
-                subject=settings.EMAIL_SUBJECT_PREFIX + force_unicode(subject),
-                message_body=message,
-                priority=priority).save()
+    return Message.objects.enqueue([to_address for name, to_address in settings.ADMINS],
+                                   settings.SERVER_EMAIL,
+                                   settings.EMAIL_SUBJECT_PREFIX + force_unicode(subject),
+                                   message, priority=priority)
 
 def mail_managers(subject, message, fail_silently=False, priority="medium"):
     from django.utils.encoding import force_unicode
     from django.conf import settings
     from django_mailer.models import Message
     priority = PRIORITY_MAPPING[priority]
-    for name, to_address in settings.MANAGERS:
-        Message(to_address=to_address,
-                from_address=settings.SERVER_EMAIL,
-                subject=settings.EMAIL_SUBJECT_PREFIX + force_unicode(subject),
-                message_body=message,
-                priority=priority).save()
+    return Message.objects.enqueue([to_address for name, to_address in settings.MANAGERS],
+                                   settings.SERVER_EMAIL,
+                                   settings.EMAIL_SUBJECT_PREFIX + force_unicode(subject),
+                                   message, priority=priority)
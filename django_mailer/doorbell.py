@@ -0,0 +1,86 @@
+"""
+A doorbell that wakes up ``send_loop`` as soon as mail is queued.
+
+``send_loop`` listens on a UDP socket on localhost; ``ring()`` (called once
+mail has been committed to the queue) sends it a datagram. A ring that
+nobody hears is harmless, and a loop that couldn't bind the socket, or
+missed a ring, still polls the queue every MAILER_DOORBELL_SLEEP seconds.
+"""
+
+import time
+import select
+import socket
+import logging
+
+from django.conf import settings
+
+# the localhost UDP port the doorbell rings on; None turns it off.
+DOORBELL_HOST = getattr(settings, "MAILER_DOORBELL_HOST", "127.0.0.1")
+DOORBELL_PORT = getattr(settings, "MAILER_DOORBELL_PORT", 10025)
+
+
+def ring(host=DOORBELL_HOST, port=DOORBELL_PORT):
+    """
+    Tell a waiting send_loop that there is mail in the queue.
+    """
+    
+    if port is None:
+        return
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        try:
+            sock.sendto("1", (host, port))
+        except socket.error:
+            pass
+    finally:
+        sock.close()
+
+
+class Doorbell(object):
+    """
+    The listening end of ring(). If the socket can't be bound (the doorbell
+    is turned off, or another send_loop already has it) wait() just sleeps.
+    """
+    
+    def __init__(self, host=DOORBELL_HOST, port=DOORBELL_PORT):
+        self.socket = None
+        self.port = None
+        if port is None:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((host, port))
+        except socket.error, err:
+            logging.warning("can't listen for the doorbell on %s:%s (%s), polling instead" % (host, port, err))
+            sock.close()
+            return
+        self.socket = sock
+        self.port = sock.getsockname()[1]
+    
+    def wait(self, timeout):
+        """
+        Wait up to ``timeout`` seconds for a ring. Returns whether it rang;
+        rings that arrived meanwhile are all answered at once.
+        """
+        
+        if self.socket is None:
+            time.sleep(timeout)
+            return False
+        readable = select.select([self.socket], [], [], timeout)[0]
+        if not readable:
+            return False
+        self.socket.setblocking(0)
+        try:
+            while True:
+                try:
+                    self.socket.recv(64)
+                except socket.error:
+                    break
+        finally:
+            self.socket.setblocking(1)
+        return True
+    
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
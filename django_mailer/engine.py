@@ -1,106 +1,297 @@
 import time
 import smtplib
 import logging
+import threading
 from lockfile import FileLock, AlreadyLocked, LockTimeout
 from socket import error as socket_error
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
 
-from django_mailer.models import Message, DontSendEntry, MessageLog
+from django_mailer.models import Message, MessageContent, DontSendEntry, MessageLog, normalize_address
+from django_mailer.doorbell import Doorbell
 
 from django.conf import settings
-from django.core.mail import send_mail as core_send_mail
-from django.core.mail import EmailMultiAlternatives
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection as db_connection, transaction
+from django.core.mail import SMTPConnection, EmailMessage, EmailMultiAlternatives
 
 # when queue is empty, how long to wait (in seconds) before checking again
 EMPTY_QUEUE_SLEEP = getattr(settings, "MAILER_EMPTY_QUEUE_SLEEP", 30)
 
+# the same, when send_loop is also woken up by the doorbell as mail is queued.
+DOORBELL_SLEEP = getattr(settings, "MAILER_DOORBELL_SLEEP", 300)
+
 # lock timeout value. how long to wait for the lock to become available.
 # default behavior is to never wait for the lock to be available.
 LOCK_WAIT_TIMEOUT = getattr(settings, "MAILER_LOCK_WAIT_TIMEOUT", -1)
 
+# how many messages to fetch from the queue at a time. each batch shares one
+# SMTP connection, and new high priority mail is only noticed between batches.
+BATCH_SIZE = getattr(settings, "MAILER_BATCH_SIZE", 100)
 
-def prioritize():
+# how many messages to send over one SMTP connection before opening a new one.
+MESSAGES_PER_CONNECTION = getattr(settings, "MAILER_MESSAGES_PER_CONNECTION", 50)
+
+# how many workers send mail in parallel, and whether they are processes
+# rather than threads.
+WORKERS = getattr(settings, "MAILER_WORKERS", 1)
+WORKER_PROCESSES = getattr(settings, "MAILER_WORKER_PROCESSES", False)
+
+
+class ReusableConnection(object):
     """
-    Yield the messages in the queue in the order they should be sent.
+    An SMTP connection that stays open across messages. It is reopened after
+    MESSAGES_PER_CONNECTION messages, or when the server drops it.
+    """
+    
+    def __init__(self, max_messages=MESSAGES_PER_CONNECTION):
+        self.max_messages = max_messages
+        self.connection = None
+        self.sent = 0
+    
+    def open(self):
+        if self.connection is None or (self.max_messages and self.sent >= self.max_messages):
+            self.close()
+            logging.debug("opening SMTP connection")
+            # only keep a connection that did open: closing one that didn't
+            # raises AttributeError in SMTPConnection.close()
+            connection = SMTPConnection()
+            connection.open()
+            self.connection = connection
+            self.sent = 0
+        return self.connection
+    
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except (socket_error, smtplib.SMTPException):
+                pass
+            self.connection = None
+    
+    def send(self, email):
+        """
+        Send ``email`` over the open connection. A connection the server has
+        dropped since the last message is reopened and the message sent again
+        once; any other failure closes the connection and is raised.
+        """
+        try:
+            try:
+                email.connection = self.open()
+                email.send()
+            except smtplib.SMTPServerDisconnected:
+                logging.debug("SMTP connection lost, reconnecting")
+                self.close()
+                email.connection = self.open()
+                email.send()
+        except (socket_error, smtplib.SMTPServerDisconnected):
+            self.close()
+            raise
+        self.sent += 1
+
+
+def prioritized_batches(batch_size=BATCH_SIZE):
+    """
+    Yield the messages in the queue, in the order they should be sent, as
+    lists of at most ``batch_size`` messages.
+    
+    Each batch is claimed with ``Message.objects.claim``, ordered by priority
+    and age, so high priority mail queued meanwhile is picked up by the next
+    batch and concurrent workers never get the same message. Messages are
+    expected to leave the queue (be sent or deferred) before the next batch
+    is claimed; any that don't stay claimed until MAILER_CLAIM_TIMEOUT.
     """
     
     while True:
-        while Message.objects.high_priority().count() or Message.objects.medium_priority().count():
-            while Message.objects.high_priority().count():
-                for message in Message.objects.high_priority().order_by('when_added'):
-                    yield message
-            while Message.objects.high_priority().count() == 0 and Message.objects.medium_priority().count():
-                yield Message.objects.medium_priority().order_by('when_added')[0]
-        while Message.objects.high_priority().count() == 0 and Message.objects.medium_priority().count() == 0 and Message.objects.low_priority().count():
-            yield Message.objects.low_priority().order_by('when_added')[0]
-        if Message.objects.non_deferred().count() == 0:
+        batch = Message.objects.claim(batch_size)
+        if not batch:
             break
+        yield batch
 
 
-def send_all():
+def prioritize():
     """
-    Send all eligible messages in the queue.
+    Yield the messages in the queue in the order they should be sent.
     """
     
-    lock = FileLock("send_mail")
+    for batch in prioritized_batches():
+        for message in batch:
+            yield message
+
+
+def build_email(message):
+    """
+    Build the EmailMessage to send for a queued ``Message``.
+    """
     
-    logging.debug("acquiring lock...")
-    try:
-        lock.acquire(LOCK_WAIT_TIMEOUT)
-    except AlreadyLocked:
-        logging.debug("lock already in place. quitting.")
-        return
-    except LockTimeout:
-        logging.debug("waiting for the lock timed out. quitting.")
-        return
-    logging.debug("acquired.")
+    if not message.body_html:
+        return EmailMessage(message.subject, message.body, message.from_address, [message.to_address])
+    email = EmailMultiAlternatives(message.subject, message.body, message.from_address, [message.to_address])
+    email.attach_alternative(message.body_html, 'text/html')
+    return email
+
+
+def send_batch(batch, dont_send_addresses):
+    """
+    Send one batch of claimed messages over a shared SMTP connection and
+    return the number (sent, deferred, don't send).
+    """
     
-    start_time = time.time()
+    suppressed = []
+    to_send = []
+    for message in batch:
+        if normalize_address(message.to_address) in dont_send_addresses:
+            logging.info("skipping email to %s as on don't send list " % message.to_address)
+            suppressed.append(message)
+        else:
+            to_send.append(message)
+    if suppressed:
+        MessageLog.objects.log_many(suppressed, 2) # @@@ avoid using literal result code
+        Message.objects.filter(pk__in=[message.pk for message in suppressed]).delete()
     
-    dont_send = 0
-    deferred = 0
     sent = 0
-    
+    deferred = 0
+    connection = ReusableConnection()
     try:
-        for message in prioritize():
-            if DontSendEntry.objects.has_address(message.to_address):
-                logging.info("skipping email to %s as on don't send list " % message.to_address)
-                MessageLog.objects.log(message, 2) # @@@ avoid using literal result code
+        for message in to_send:
+            try:
+                logging.info("sending message '%s' to %s" % (message.subject.encode("utf-8"), message.to_address.encode("utf-8")))
+                connection.send(build_email(message))
+                MessageLog.objects.log(message, 1) # @@@ avoid using literal result code
                 message.delete()
-                dont_send += 1
-            else:
-                try:
-                    logging.info("sending message '%s' to %s" % (message.subject.encode("utf-8"), message.to_address.encode("utf-8")))
-                    if not message.message_body_html:
-                        core_send_mail(message.subject, message.message_body, message.from_address, [message.to_address])
-                    else:
-                        email = EmailMultiAlternatives(message.subject, message.message_body, message.from_address, [message.to_address])
-                        email.attach_alternative(message.message_body_html, 'text/html')
-                        email.send()
-                    MessageLog.objects.log(message, 1) # @@@ avoid using literal result code
-                    message.delete()
-                    sent += 1
-                except (socket_error, smtplib.SMTPSenderRefused, smtplib.SMTPRecipientsRefused, smtplib.SMTPAuthenticationError), err:
-                    message.defer()
-                    logging.info("message deferred due to failure: %s" % err)
-                    MessageLog.objects.log(message, 3, log_message=str(err)) # @@@ avoid using literal result code
-                    deferred += 1
+                sent += 1
+            except (socket_error, smtplib.SMTPSenderRefused, smtplib.SMTPRecipientsRefused, smtplib.SMTPAuthenticationError, smtplib.SMTPServerDisconnected), err:
+                message.defer()
+                logging.info("message deferred due to failure: %s" % err)
+                MessageLog.objects.log(message, 3, log_message=str(err)) # @@@ avoid using literal result code
+                deferred += 1
+    finally:
+        connection.close()
+    return sent, deferred, len(suppressed)
+
+
+def deliver(worker=0):
+    """
+    Claim and send batches until the queue is empty. This is what each
+    worker runs; returns the number (sent, deferred, don't send).
+    """
+    
+    # the don't send list is read once per run
+    dont_send_addresses = DontSendEntry.objects.addresses()
+    totals = [0, 0, 0]
+    try:
+        for batch in prioritized_batches():
+            logging.debug("worker %s claimed %s message(s)" % (worker, len(batch)))
+            for i, count in enumerate(send_batch(batch, dont_send_addresses)):
+                totals[i] += count
+    finally:
+        if worker:
+            # workers in a pool each have their own database connection
+            db_connection.close()
+    return tuple(totals)
+
+
+def deliver_in_threads(workers):
+    results = []
+    def run(worker):
+        results.append(deliver(worker))
+    threads = [threading.Thread(target=run, args=(worker,)) for worker in range(1, workers + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def deliver_in_processes(workers):
+    if multiprocessing is None:
+        raise ImproperlyConfigured("MAILER_WORKER_PROCESSES needs the multiprocessing module (Python 2.6+)")
+    # the children must not share this process's database connection
+    db_connection.close()
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(deliver, range(1, workers + 1))
     finally:
-        logging.debug("releasing lock...")
-        lock.release()
-        logging.debug("released.")
+        pool.close()
+        pool.join()
+
+
+def send_all(workers=WORKERS, processes=WORKER_PROCESSES):
+    """
+    Send all eligible messages in the queue and return how many were sent,
+    deferred or not sent because of the don't send list; 0 when another run
+    holds the lock.
+    
+    With a single worker a file lock keeps cron-started runs from
+    overlapping. With more, ``workers`` threads (or processes) claim
+    disjoint batches from the queue and send them in parallel.
+    """
+    
+    if workers <= 1:
+        lock = FileLock("send_mail")
+        
+        logging.debug("acquiring lock...")
+        try:
+            lock.acquire(LOCK_WAIT_TIMEOUT)
+        except AlreadyLocked:
+            logging.debug("lock already in place. quitting.")
+            return 0
+        except LockTimeout:
+            logging.debug("waiting for the lock timed out. quitting.")
+            return 0
+        logging.debug("acquired.")
+    
+    start_time = time.time()
+    
+    try:
+        if workers <= 1:
+            results = [deliver()]
+        elif processes:
+            results = deliver_in_processes(workers)
+        else:
+            results = deliver_in_threads(workers)
+        MessageContent.objects.delete_unused()
+    finally:
+        if workers <= 1:
+            logging.debug("releasing lock...")
+            lock.release()
+            logging.debug("released.")
     
+    sent, deferred, dont_send = [sum(counts) for counts in zip((0, 0, 0), *results)]
     logging.info("")
     logging.info("%s sent; %s deferred; %s don't send" % (sent, deferred, dont_send))
     logging.info("done in %.2f seconds" % (time.time() - start_time))
+    return sent + deferred + dont_send
 
 def send_loop():
     """
-    Loop indefinitely, checking queue at intervals of EMPTY_QUEUE_SLEEP and
-    sending messages if any are on queue.
+    Loop indefinitely, sending messages whenever there are any on the queue.
+    An empty queue is checked again as soon as the doorbell rings, or after
+    EMPTY_QUEUE_SLEEP seconds (DOORBELL_SLEEP while listening for it). So is
+    a queue whose messages are all claimed by other workers, or that another
+    run holds the lock for.
     """
     
-    while True:
-        while not Message.objects.all():
-            logging.debug("sleeping for %s seconds before checking queue again" % EMPTY_QUEUE_SLEEP)
-            time.sleep(EMPTY_QUEUE_SLEEP)
-        send_all()
+    doorbell = Doorbell()
+    if doorbell.socket is not None:
+        sleep = DOORBELL_SLEEP
+    else:
+        sleep = EMPTY_QUEUE_SLEEP
+    try:
+        while True:
+            while True:
+                # end the current transaction, or the query below keeps
+                # reading the same snapshot of the queue
+                transaction.commit_unless_managed()
+                if Message.objects.claimable()[:1]:
+                    break
+                logging.debug("waiting up to %s seconds before checking queue again" % sleep)
+                doorbell.wait(sleep)
+            if not send_all():
+                # another run has the lock, or claimed the messages first
+                logging.debug("nothing sent, waiting up to %s seconds" % sleep)
+                doorbell.wait(sleep)
+    finally:
+        doorbell.close()
@@ -0,0 +1,70 @@
+import os
+import gzip
+import logging
+from datetime import datetime, timedelta
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import NoArgsCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import simplejson
+
+from django_mailer.models import MessageLog
+
+# how many days of MessageLog entries to keep in the database.
+LOG_RETENTION_DAYS = getattr(settings, "MAILER_LOG_RETENTION_DAYS", 30)
+
+# where the archives of older entries are written.
+LOG_ARCHIVE_DIR = getattr(settings, "MAILER_LOG_ARCHIVE_DIR", ".")
+
+FIELDS = ('id', 'to_address', 'from_address', 'subject', 'message_body', 'message_body_html', 'message_hash',
+    'when_added', 'priority', 'when_attempted', 'result', 'log_message')
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+        make_option('--days', action='store', dest='days', type='int', default=LOG_RETENTION_DAYS,
+            help='Archive entries older than this many days (default: MAILER_LOG_RETENTION_DAYS).'),
+        make_option('--dir', action='store', dest='dir', default=LOG_ARCHIVE_DIR,
+            help='Directory to write the archive to (default: MAILER_LOG_ARCHIVE_DIR).'),
+        make_option('--batch-size', action='store', dest='batch_size', type='int', default=1000,
+            help='Number of entries read, written and deleted at a time (default: 1000).'),
+    )
+    help = 'Move old mail log entries to a gzipped JSON-lines archive.'
+    
+    def handle_noargs(self, **options):
+        logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+        if not os.path.isdir(options['dir']):
+            raise CommandError("%s is not a directory" % options['dir'])
+        now = datetime.now()
+        old = MessageLog.objects.older_than(now - timedelta(days=options['days'])).order_by('id')
+        filename = os.path.join(options['dir'], "message_log-%s.jsonl.gz" % now.strftime("%Y%m%d%H%M%S"))
+        
+        archive = None
+        count = 0
+        last_id = 0
+        try:
+            while True:
+                # each batch is read by id, so memory use doesn't grow with
+                # the size of the table
+                batch = list(old.filter(id__gt=last_id).values(*FIELDS)[:options['batch_size']])
+                if not batch:
+                    break
+                if archive is None:
+                    archive = gzip.open(filename, "wb")
+                for entry in batch:
+                    archive.write(simplejson.dumps(entry, cls=DjangoJSONEncoder))
+                    archive.write("\n")
+                archive.flush()
+                last_id = batch[-1]['id']
+                # only delete what has been written out
+                MessageLog.objects.filter(id__in=[entry['id'] for entry in batch]).delete()
+                count += len(batch)
+                logging.debug("archived %s entries" % count)
+        finally:
+            if archive is not None:
+                archive.close()
+        
+        if count:
+            logging.info("%s log entries archived to %s" % (count, filename))
+        else:
+            logging.info("no log entries to archive")
@@ -1,14 +1,21 @@
 import logging
+from optparse import make_option
 
 from django.conf import settings
 from django.core.management.base import NoArgsCommand
 
-from django_mailer.engine import send_all
+from django_mailer.engine import send_all, WORKERS, WORKER_PROCESSES
 
 # allow a sysadmin to pause the sending of mail temporarily.
 PAUSE_SEND = getattr(settings, "MAILER_PAUSE_SEND", False)
 
 class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+        make_option('--workers', action='store', dest='workers', type='int', default=WORKERS,
+            help='Number of workers sending mail in parallel (default: MAILER_WORKERS).'),
+        make_option('--processes', action='store_true', dest='processes', default=WORKER_PROCESSES,
+            help='Run the workers as processes rather than threads.'),
+    )
     help = 'Do one pass through the mail queue, attempting to send all mail.'
     
     def handle_noargs(self, **options):
@@ -16,6 +23,6 @@ class Command(NoArgsCommand):
         logging.info("-" * 72)
         # if PAUSE_SEND is turned on don't do anything.
         if not PAUSE_SEND:
-            send_all()
+            send_all(options['workers'], options['processes'])
         else:
             logging.info("sending is paused, quitting.")
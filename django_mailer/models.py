@@ -1,6 +1,12 @@
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 
-from django.db import models
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.utils.hashcompat import sha_constructor
+
+from django_mailer.doorbell import ring
 
 
 PRIORITIES = (
@@ -11,6 +17,39 @@ PRIORITIES = (
 )
 
 
+# how many recipients to write per multi-row INSERT when enqueueing in bulk
+ENQUEUE_CHUNK_SIZE = getattr(settings, "MAILER_ENQUEUE_CHUNK_SIZE", 500)
+
+# how long (in seconds) a worker may hold claimed messages before other
+# workers assume it died and claim them again.
+CLAIM_TIMEOUT = getattr(settings, "MAILER_CLAIM_TIMEOUT", 600)
+
+# deferred messages are retried after RETRY_BASE_DELAY seconds, doubling
+# with every failed attempt up to RETRY_MAX_DELAY.
+RETRY_BASE_DELAY = getattr(settings, "MAILER_RETRY_BASE_DELAY", 60)
+RETRY_MAX_DELAY = getattr(settings, "MAILER_RETRY_MAX_DELAY", 24 * 60 * 60)
+
+
+def bulk_insert(model, field_names, rows):
+    """
+    Insert ``rows`` (sequences of values in ``field_names`` order) into the
+    table of ``model`` with a single executemany(), which MySQLdb sends as
+    one multi-row INSERT.
+    """
+    
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in field_names]
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        qn(model._meta.db_table),
+        ", ".join([qn(field.column) for field in fields]),
+        ", ".join(["%s"] * len(fields)),
+    )
+    params = [[field.get_db_prep_save(value) for field, value in zip(fields, row)] for row in rows]
+    connection.cursor().executemany(sql, params)
+    transaction.commit_unless_managed()
+
 
 class MessageManager(models.Manager):
     
@@ -49,14 +88,109 @@ class MessageManager(models.Manager):
     
         return self.filter(priority='4')
     
+    def due(self):
+        """
+        the messages whose next attempt is not in the future
+        """
+        
+        return self.filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=datetime.now()))
+    
+    def eligible(self):
+        """
+        the messages in the queue that can be sent now
+        """
+        
+        return self.due().filter(priority__lt='4')
+    
+    def claimable(self, timeout=CLAIM_TIMEOUT, now=None):
+        """
+        the eligible messages that aren't claimed, or whose claim is more
+        than timeout seconds old
+        """
+        
+        now = now or datetime.now()
+        return self.eligible().filter(Q(claimed_by__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=timeout)))
+    
+    def claim(self, batch_size, timeout=CLAIM_TIMEOUT):
+        """
+        atomically claim up to batch_size of the next messages to send,
+        highest priority and oldest first, and return them. messages claimed
+        by another worker less than timeout seconds ago are left alone, so
+        concurrent workers always get disjoint batches.
+        """
+        
+        token = uuid.uuid4().hex
+        now = datetime.now()
+        unclaimed = Q(claimed_by__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=timeout))
+        candidates = list(self.claimable(timeout, now).order_by('priority', 'when_added', 'id').values_list('id', flat=True)[:batch_size])
+        if not candidates:
+            return []
+        # the UPDATE re-checks the claim, so a worker that lost the race for
+        # some of the candidates just gets fewer messages
+        self.filter(unclaimed, pk__in=candidates).update(claimed_by=token, claimed_at=now)
+        return list(self.filter(claimed_by=token).select_related('content').order_by('priority', 'when_added', 'id'))
+    
+    def enqueue(self, recipient_list, from_address, subject, message_body, message_body_html=None, priority='2'):
+        """
+        queue one message for every address in recipient_list. the bodies
+        are stored once and shared by all the recipients, which are written
+        in chunks of multi-row INSERTs inside a single transaction. returns
+        the number of messages queued.
+        """
+        
+        recipient_list = list(recipient_list)
+        if not recipient_list:
+            return 0
+        count = self._enqueue(recipient_list, from_address, subject, message_body, message_body_html, priority)
+        # only once the messages are committed can send_loop see them
+        ring()
+        return count
+    
+    def _enqueue(self, recipient_list, from_address, subject, message_body, message_body_html, priority):
+        content = MessageContent.objects.create(message_body=message_body, message_body_html=message_body_html)
+        now = datetime.now()
+        field_names = ['to_address', 'from_address', 'subject', 'message_body', 'content', 'when_added', 'priority']
+        for start in range(0, len(recipient_list), ENQUEUE_CHUNK_SIZE):
+            bulk_insert(self.model, field_names, [
+                (to_address, from_address, subject, '', content.pk, now, priority)
+                for to_address in recipient_list[start:start + ENQUEUE_CHUNK_SIZE]
+            ])
+        return len(recipient_list)
+    _enqueue = transaction.commit_on_success(_enqueue)
+    
     def retry_deferred(self, new_priority=2):
-        count = 0
-        for message in self.deferred():
-            if message.retry(new_priority):
-                count += 1
+        """
+        put the deferred messages that are due for another attempt back on
+        the queue, with a single UPDATE. returns the number of messages.
+        """
+        
+        count = self.due().filter(priority='4').update(priority=str(new_priority))
+        if count:
+            ring()
         return count
 
 
+class MessageContentManager(models.Manager):
+    
+    def delete_unused(self):
+        """
+        delete the contents no queued message refers to any more
+        """
+        
+        self.filter(message__isnull=True).delete()
+
+
+class MessageContent(models.Model):
+    """
+    the bodies of a message sent to many recipients, stored once
+    """
+    
+    objects = MessageContentManager()
+    
+    message_body = models.TextField()
+    message_body_html = models.TextField(null = True, blank = True)
+
+
 class Message(models.Model):
     
     objects = MessageManager()
@@ -64,15 +198,40 @@ class Message(models.Model):
     to_address = models.CharField(max_length=50)
     from_address = models.CharField(max_length=50)
     subject = models.CharField(max_length=100)
-    message_body = models.TextField()
+    # messages queued in bulk leave these empty and share a MessageContent
+    message_body = models.TextField(blank = True)
     message_body_html = models.TextField(null = True, blank = True)
+    content = models.ForeignKey(MessageContent, null = True, blank = True)
     when_added = models.DateTimeField(default=datetime.now)
     priority = models.CharField(max_length=1, choices=PRIORITIES, default='2')
+    # set while a worker is sending the message
+    claimed_by = models.CharField(max_length=32, null = True, blank = True, db_index = True)
+    claimed_at = models.DateTimeField(null = True, blank = True)
+    # failed attempts so far, and when the next one may be made
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null = True, blank = True)
     # @@@ campaign?
     # @@@ content_type?
     
+    def _get_body(self):
+        if self.content_id is not None:
+            return self.content.message_body
+        return self.message_body
+    body = property(_get_body)
+    
+    def _get_body_html(self):
+        if self.content_id is not None:
+            return self.content.message_body_html
+        return self.message_body_html
+    body_html = property(_get_body_html)
+    
     def defer(self):
+        self.attempts += 1
+        delay = min(RETRY_BASE_DELAY * 2 ** (self.attempts - 1), RETRY_MAX_DELAY)
+        self.next_attempt_at = datetime.now() + timedelta(seconds=delay)
         self.priority = '4'
+        self.claimed_by = None
+        self.claimed_at = None
         self.save()
     
     def retry(self, new_priority=2):
@@ -84,6 +243,14 @@ class Message(models.Model):
             return False
     
 
+def normalize_address(address):
+    """
+    addresses on the don't send list are compared case-insensitively
+    """
+    
+    return address.strip().lower()
+
+
 class DontSendEntryManager(models.Manager):
     
     def has_address(self, address):
@@ -91,17 +258,25 @@ class DontSendEntryManager(models.Manager):
         is the given address on the don't send list?
         """
         
-        if self.filter(to_address=address).count() > 0: # @@@ is there a better way?
+        if self.filter(to_address=normalize_address(address)).count() > 0:
             return True
         else:
             return False
+    
+    def addresses(self):
+        """
+        the set of all (normalized) addresses on the don't send list
+        """
+        
+        # rows added before addresses were normalized on save may not be
+        return set([normalize_address(address) for address in self.values_list('to_address', flat=True)])
 
 
 class DontSendEntry(models.Model):
     
     objects = DontSendEntryManager()
     
-    to_address = models.CharField(max_length=50)
+    to_address = models.CharField(max_length=50, unique=True)
     when_added = models.DateTimeField()
     # @@@ who added?
     # @@@ comment field?
@@ -110,6 +285,10 @@ class DontSendEntry(models.Model):
         verbose_name = 'don\'t send entry'
         verbose_name_plural = 'don\'t send entries'
     
+    def save(self, force_insert=False, force_update=False):
+        self.to_address = normalize_address(self.to_address)
+        super(DontSendEntry, self).save(force_insert, force_update)
+    
 
 RESULT_CODES = (
     ('1', 'success'),
@@ -120,27 +299,69 @@ RESULT_CODES = (
 
 
 
+def content_hash(message):
+    """
+    the sha1 of a message's subject and bodies
+    """
+    
+    content = u"\0".join([message.subject, message.body, message.body_html or u""])
+    return sha_constructor(content.encode("utf-8")).hexdigest()
+
+
 class MessageLogManager(models.Manager):
     
+    def _values(self, message, result_code):
+        """
+        the body fields to log for a message: the full bodies for failures
+        but only a hash of them otherwise
+        """
+        
+        if result_code == 3 or result_code == '3':
+            return message.body, message.body_html, ''
+        return '', None, content_hash(message)
+    
     def log(self, message, result_code, log_message = ''):
         """
         create a log entry for an attempt to send the given message and
         record the given result and (optionally) a log message
         """
         
-        message_log = self.create(
+        message_body, message_body_html, message_hash = self._values(message, result_code)
+        self.create(
             to_address = message.to_address,
             from_address = message.from_address,
             subject = message.subject,
-            message_body = message.message_body,
-            message_body_html = message.message_body_html,
+            message_body = message_body,
+            message_body_html = message_body_html,
+            message_hash = message_hash,
             when_added = message.when_added,
             priority = message.priority,
             # @@@ other fields from Message
             result = result_code,
             log_message = log_message,
         )
-        message_log.save()
+    
+    def log_many(self, messages, result_code, log_message = ''):
+        """
+        create log entries for a list of messages that all had the same
+        result, with a single bulk insert
+        """
+        
+        now = datetime.now()
+        field_names = ['to_address', 'from_address', 'subject', 'message_body', 'message_body_html', 'message_hash',
+            'when_added', 'priority', 'when_attempted', 'result', 'log_message']
+        bulk_insert(self.model, field_names, [
+            (message.to_address, message.from_address, message.subject) + self._values(message, result_code) +
+            (message.when_added, message.priority, now, result_code, log_message)
+            for message in messages
+        ])
+    
+    def older_than(self, when):
+        """
+        the log entries for attempts made before when
+        """
+        
+        return self.filter(when_attempted__lt=when)
 
 
 class MessageLog(models.Model):
@@ -151,14 +372,17 @@ class MessageLog(models.Model):
     to_address = models.CharField(max_length=50)
     from_address = models.CharField(max_length=50)
     subject = models.CharField(max_length=100)
-    message_body = models.TextField()
+    # the bodies are only kept for failures; the other entries just have
+    # the hash of the subject and bodies
+    message_body = models.TextField(blank = True)
     message_body_html = models.TextField(null = True, blank = True)
+    message_hash = models.CharField(max_length=40, blank = True)
     when_added = models.DateTimeField()
     priority = models.CharField(max_length=1, choices=PRIORITIES)
     # @@@ campaign?
     
     # additional logging fields
-    when_attempted = models.DateTimeField(default=datetime.now)
+    when_attempted = models.DateTimeField(default=datetime.now, db_index=True)
     result = models.CharField(max_length=1, choices=RESULT_CODES)
     log_message = models.TextField()
     
@@ -0,0 +1,276 @@
+import asyncore
+import gzip
+import os
+import shutil
+import smtpd
+import socket
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import simplejson
+
+from django_mailer import send_mail
+from django_mailer.doorbell import Doorbell, ring
+from django_mailer import engine
+from django_mailer.engine import send_all
+from django_mailer.models import Message, DontSendEntry, MessageLog, content_hash
+
+class StubSMTPChannel(smtpd.SMTPChannel):
+    def smtp_RCPT(self, arg):
+        if arg and arg.rstrip(">").endswith("@refused.example.com"):
+            self.push("550 No such user")
+            return
+        smtpd.SMTPChannel.smtp_RCPT(self, arg)
+
+class StubSMTPServer(smtpd.SMTPServer):
+    """
+    An SMTP server on a free localhost port that keeps the messages it gets
+    and refuses recipients at ``refused.example.com``
+    """
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ("127.0.0.1", 0), None)
+        self.port = self.socket.getsockname()[1]
+        self.received = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            StubSMTPChannel(self, *pair)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.lock.acquire()
+        try:
+            self.received.append((rcpttos, data))
+        finally:
+            self.lock.release()
+
+    def start(self):
+        self.thread = threading.Thread(target=asyncore.loop, kwargs={"timeout": 0.1})
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def stop(self):
+        self.close()
+        self.thread.join()
+
+    def recipients(self):
+        return [rcpttos[0] for rcpttos, data in self.received]
+
+class StubSMTPMixin(object):
+    def setUp(self):
+        self.server = StubSMTPServer()
+        self.server.start()
+        self.old_email_settings = settings.EMAIL_HOST, settings.EMAIL_PORT
+        settings.EMAIL_HOST, settings.EMAIL_PORT = "127.0.0.1", self.server.port
+
+    def tearDown(self):
+        settings.EMAIL_HOST, settings.EMAIL_PORT = self.old_email_settings
+        self.server.stop()
+
+class SendAllTest(StubSMTPMixin, TestCase):
+    def test_priorities(self):
+        send_mail("Low", "body", "from@example.com", ["low@example.com"], priority="low")
+        send_mail("Medium", "body", "from@example.com", ["medium@example.com"])
+        send_mail("High", "body", "from@example.com", ["high@example.com"], priority="high")
+        send_all()
+        self.assertEqual(self.server.recipients(), ["high@example.com", "medium@example.com", "low@example.com"])
+        self.assertEqual(Message.objects.count(), 0)
+        self.assertEqual(MessageLog.objects.filter(result="1").count(), 3)
+
+    def test_refused_recipient_is_deferred(self):
+        send_mail("Subject", "body", "from@example.com", ["someone@example.com", "nobody@refused.example.com"])
+        send_all()
+        self.assertEqual(self.server.recipients(), ["someone@example.com"])
+        deferred = Message.objects.get()
+        self.assertEqual(deferred.to_address, "nobody@refused.example.com")
+        self.assertEqual(deferred.priority, "4")
+        self.assertEqual(deferred.claimed_by, None)
+
+    def test_dont_send(self):
+        DontSendEntry.objects.create(to_address="Blocked@Example.com", when_added=datetime.now())
+        send_mail("Subject", "body", "from@example.com", ["someone@example.com", "blocked@example.COM"])
+        send_all()
+        self.assertEqual(self.server.recipients(), ["someone@example.com"])
+        self.assertEqual(Message.objects.count(), 0)
+        self.assertEqual(MessageLog.objects.filter(result="2").count(), 1)
+
+    def test_dont_send_entries_saved_before_normalizing(self):
+        entry = DontSendEntry.objects.create(to_address="blocked@example.com", when_added=datetime.now())
+        # as stored before DontSendEntry.save() lower-cased addresses
+        DontSendEntry.objects.filter(pk=entry.pk).update(to_address=" Blocked@Example.com")
+        self.assertEqual(DontSendEntry.objects.addresses(), set(["blocked@example.com"]))
+        send_mail("Subject", "body", "from@example.com", ["someone@example.com", "blocked@example.com"])
+        send_all()
+        self.assertEqual(self.server.recipients(), ["someone@example.com"])
+        self.assertEqual(MessageLog.objects.filter(result="2").count(), 1)
+
+class RelayDownTest(TestCase):
+    def setUp(self):
+        # a port nothing listens on
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        self.old_email_settings = settings.EMAIL_HOST, settings.EMAIL_PORT
+        settings.EMAIL_HOST, settings.EMAIL_PORT = "127.0.0.1", port
+
+    def tearDown(self):
+        settings.EMAIL_HOST, settings.EMAIL_PORT = self.old_email_settings
+
+    def test_refused_connection_defers(self):
+        send_mail("Subject", "body", "from@example.com", ["one@example.com", "two@example.com"])
+        send_all()
+        self.assertEqual(Message.objects.filter(priority="4").count(), 2)
+        self.assertEqual(MessageLog.objects.filter(result="3").count(), 2)
+
+class ClaimTest(TestCase):
+    def test_claims_are_disjoint(self):
+        send_mail("Subject", "body", "from@example.com", ["%d@example.com" % i for i in range(5)])
+        first = Message.objects.claim(3)
+        second = Message.objects.claim(3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertEqual(set([m.pk for m in first]) & set([m.pk for m in second]), set())
+        self.assertEqual(Message.objects.claim(3), [])
+
+    def test_stale_claims_are_reclaimed(self):
+        send_mail("Subject", "body", "from@example.com", ["someone@example.com"])
+        self.assertEqual(len(Message.objects.claim(1)), 1)
+        self.assertEqual(Message.objects.claim(1), [])
+        self.assertEqual(len(Message.objects.claim(1, timeout=-1)), 1)
+
+class RetryTest(TestCase):
+    def setUp(self):
+        send_mail("Subject", "body", "from@example.com", ["someone@example.com"])
+        self.message = Message.objects.get()
+
+    def test_backoff(self):
+        self.message.defer()
+        first = self.message.next_attempt_at - datetime.now()
+        self.message.defer()
+        second = self.message.next_attempt_at - datetime.now()
+        self.assertEqual(self.message.attempts, 2)
+        self.assert_(second > first + timedelta(seconds=30))
+
+    def test_retry_deferred_only_when_due(self):
+        self.message.defer()
+        self.assertEqual(Message.objects.retry_deferred(), 0)
+        self.assertEqual(Message.objects.get().priority, "4")
+        Message.objects.update(next_attempt_at=datetime.now() - timedelta(seconds=1))
+        self.assertEqual(Message.objects.retry_deferred(), 1)
+        self.assertEqual(Message.objects.get().priority, "2")
+
+    def test_claim_skips_messages_not_due(self):
+        Message.objects.update(next_attempt_at=datetime.now() + timedelta(hours=1))
+        self.assertEqual(Message.objects.claim(10), [])
+
+class WorkerPoolTest(StubSMTPMixin, TransactionTestCase):
+    """ The workers use their own database connections, so the messages have to be committed """
+    def test_threads(self):
+        recipients = ["%d@example.com" % i for i in range(20)]
+        send_mail("Subject", "body", "from@example.com", recipients)
+        send_all(workers=4)
+        self.assertEqual(sorted(self.server.recipients()), sorted(recipients))
+        self.assertEqual(Message.objects.count(), 0)
+        self.assertEqual(MessageLog.objects.count(), 20)
+
+class StopLoop(Exception):
+    pass
+
+class RecordingDoorbell(object):
+    """ stands in for the doorbell in send_loop, ending the loop on the first wait """
+    socket = None
+
+    def __init__(self, *args, **kwargs):
+        self.waits = []
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        raise StopLoop
+
+    def close(self):
+        pass
+
+class SendLoopTest(TestCase):
+    def setUp(self):
+        self.sends = []
+        self.old = engine.Doorbell, engine.send_all
+        engine.Doorbell = RecordingDoorbell
+        engine.send_all = self.send_all
+
+    def tearDown(self):
+        engine.Doorbell, engine.send_all = self.old
+
+    def send_all(self):
+        self.sends.append(True)
+        return 0
+
+    def test_claimed_message_waits(self):
+        send_mail("Subject", "body", "from@example.com", ["someone@example.com"])
+        # claimed by another worker that hasn't sent it yet
+        self.assertEqual(len(Message.objects.claim(1)), 1)
+        self.assertRaises(StopLoop, engine.send_loop)
+        self.assertEqual(self.sends, [])
+
+    def test_locked_queue_waits(self):
+        send_mail("Subject", "body", "from@example.com", ["someone@example.com"])
+        # send_all() handled nothing, e.g. a cron run holds the lock
+        self.assertRaises(StopLoop, engine.send_loop)
+        self.assertEqual(self.sends, [True])
+
+class DoorbellTest(TestCase):
+    def test_ring(self):
+        doorbell = Doorbell("127.0.0.1", 0)
+        try:
+            self.assertFalse(doorbell.wait(0))
+            ring("127.0.0.1", doorbell.port)
+            ring("127.0.0.1", doorbell.port)
+            self.assertTrue(doorbell.wait(5))
+            # both rings are answered at once
+            self.assertFalse(doorbell.wait(0))
+        finally:
+            doorbell.close()
+
+    def test_turned_off(self):
+        doorbell = Doorbell(port=None)
+        self.assertEqual(doorbell.socket, None)
+        self.assertFalse(doorbell.wait(0))
+        ring(port=None)
+
+class MessageLogTest(TestCase):
+    def setUp(self):
+        send_mail("Subject", "body", "from@example.com", ["someone@example.com"])
+        self.message = Message.objects.get()
+
+    def test_bodies_only_kept_for_failures(self):
+        MessageLog.objects.log(self.message, 1)
+        MessageLog.objects.log(self.message, 3, log_message="refused")
+        success = MessageLog.objects.get(result="1")
+        self.assertEqual(success.message_body, "")
+        self.assertEqual(success.message_hash, content_hash(self.message))
+        failure = MessageLog.objects.get(result="3")
+        self.assertEqual(failure.message_body, "body")
+
+    def test_archive(self):
+        MessageLog.objects.log_many([self.message] * 3, 1)
+        MessageLog.objects.update(when_attempted=datetime.now() - timedelta(days=60))
+        MessageLog.objects.log(self.message, 1)
+        directory = tempfile.mkdtemp()
+        try:
+            call_command("archive_message_log", days=30, dir=directory, batch_size=2)
+            self.assertEqual(MessageLog.objects.count(), 1)
+            filenames = os.listdir(directory)
+            self.assertEqual(len(filenames), 1)
+            archive = gzip.open(os.path.join(directory, filenames[0]))
+            entries = [simplejson.loads(line) for line in archive]
+            archive.close()
+            self.assertEqual(len(entries), 3)
+            self.assertEqual(entries[0]["to_address"], "someone@example.com")
+        finally:
+            shutil.rmtree(directory)
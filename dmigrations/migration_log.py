@@ -12,6 +12,11 @@ MIGRATION_LOG_SQL = """
     ) ENGINE=InnoDB AUTO_INCREMENT=2 DEFAULT CHARSET=utf8
 """
 
+LOG_ACTION_SQL = """
+    INSERT INTO dmigrations_log(action, migration, status, datetime) 
+    VALUES (%s, %s, %s, %s)
+"""
+
 def init():
     """
     Create migration log if it doesn't exist
@@ -29,7 +34,6 @@ def get_log():
 def log_action(action, migration, status, when=None):
     if when == None:
         when = datetime.datetime.now()
-    _execute_in_transaction("""
-        INSERT INTO dmigrations_log(action, migration, status, datetime) 
-        VALUES (%s, %s, %s, %s)
-    """, [action, migration, status, when])
+    _execute_in_transaction(
+        LOG_ACTION_SQL, [action, migration, status, when]
+    )
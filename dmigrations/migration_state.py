@@ -1,5 +1,8 @@
 from django.db import connection
 from exceptions import *
+from itertools import groupby
+from operator import itemgetter
+import datetime
 import re
 
 def _execute(*sql):
@@ -28,72 +31,125 @@ class MigrationState(object):
     def __init__(self, dev=None, migration_db=None):
         self.migration_db = migration_db
         self.dev = dev
+        self._applied = None
+        self._pending_state = []
+        self._pending_log = []
     
     def migration_table_present(self):
         return table_present('dmigrations')
     
     def log(self, action, migration_name, status='success'):
-        from migration_log import log_action
-        log_action(action, migration_name, status)
+        self._log(action, migration_name, status)
+        self.flush()
+    
+    def _log(self, action, migration_name, status='success'):
+        self._pending_log.append(
+            [action, migration_name, status, datetime.datetime.now()]
+        )
+    
+    def applied(self):
+        """
+        Return the set of applied migrations. It's read from the database
+        once, then kept up to date as migrations are marked.
+        """
+        if self._applied is None:
+            self._applied = set([
+                row[0] for row in _execute(
+                    "SELECT migration FROM dmigrations"
+                ).fetchall()
+            ])
+        return self._applied
     
     def applied_but_not_in_db(self):
         migrations_in_db = set(self.migration_db.list())
-        applied_migrations = [
-            m[0] for m in _execute(
-                "SELECT migration FROM dmigrations"
-            ).fetchall()
-        ]
         return self.migration_db.sort_migrations(
-            [m for m in applied_migrations if m not in migrations_in_db]
+            [m for m in self.applied() if m not in migrations_in_db]
         )
       
     def apply(self, name):
         try:
-            migration = self.migration_db.load_migration_object(name)
-            migration.up()
-            self.mark_as_applied(name, log=False)
-            self.log('apply', name)
-        except Exception, e:
-            self.log('apply', name, str(e))
-            raise
+            try:
+                migration = self.migration_db.load_migration_object(name)
+                migration.up()
+                self._mark_as_applied(name)
+                self._log('apply', name)
+            except Exception, e:
+                self._log('apply', name, str(e))
+                raise
+        finally:
+            self.flush()
     
     def unapply(self, name):
         try:
-            migration = self.migration_db.load_migration_object(name)
-            migration.down()
-            self.mark_as_unapplied(name, log=False)
-            self.log('unapply', name)
-        except Exception, e:
-            self.log('unapply', name, str(e))
-            raise
+            try:
+                migration = self.migration_db.load_migration_object(name)
+                migration.down()
+                self._mark_as_unapplied(name)
+                self._log('unapply', name)
+            except Exception, e:
+                self._log('unapply', name, str(e))
+                raise
+        finally:
+            self.flush()
     
     def mark_as_applied(self, name, log=True):
-        if not self.is_applied(name):
-            _execute_in_transaction(
-                "INSERT INTO dmigrations (migration) VALUES (%s)", [name]
-            )
+        self._mark_as_applied(name)
         if log:
-            self.log('mark_as_applied', name)
+            self._log('mark_as_applied', name)
+        self.flush()
     
     def mark_as_unapplied(self, name, log=True):
+        self._mark_as_unapplied(name)
+        if log:
+            self._log('mark_as_unapplied', name)
+        self.flush()
+    
+    def _mark_as_applied(self, name):
+        if not self.is_applied(name):
+            self.applied().add(name)
+            self._pending_state.append(
+                ("INSERT INTO dmigrations (migration) VALUES (%s)", name)
+            )
+    
+    def _mark_as_unapplied(self, name):
         if self.is_applied(name):
-            _execute_in_transaction(
-                "DELETE FROM dmigrations WHERE migration = %s", [name]
+            self.applied().remove(name)
+            self._pending_state.append(
+                ("DELETE FROM dmigrations WHERE migration = %s", name)
             )
-        if log:
-            self.log('mark_as_unapplied', name)
       
     def is_applied(self, name):
-        cursor = _execute(
-            "SELECT * FROM dmigrations WHERE migration = %s", [name]
-        )
-        return bool(cursor.fetchone())
+        return name in self.applied()
     
     def all_migrations_applied(self):
-        cursor = _execute("SELECT migration FROM dmigrations")
-        return self.migration_db.sort_migrations(
-            [row[0] for row in cursor.fetchall()]
-        )
+        return self.migration_db.sort_migrations(list(self.applied()))
+    
+    def flush(self):
+        """
+        Write the queued bookkeeping: the changes to the dmigrations table
+        in order, each run of inserts or deletes as one executemany, then
+        all the log rows as one executemany. If a write fails the others
+        are rolled back and everything stays queued.
+        """
+        from migration_log import LOG_ACTION_SQL
+        state, self._pending_state = self._pending_state, []
+        log, self._pending_log = self._pending_log, []
+        if not state and not log:
+            return
+        cursor = connection.cursor()
+        cursor.execute("BEGIN")
+        try:
+            for sql, changes in groupby(state, itemgetter(0)):
+                cursor.executemany(sql, [[name] for sql, name in changes])
+            if log:
+                cursor.executemany(LOG_ACTION_SQL, log)
+        except:
+            # Queue it all again, so the next flush() writes it
+            cursor.execute("ROLLBACK")
+            self._pending_state = state + self._pending_state
+            self._pending_log = log + self._pending_log
+            raise
+        cursor.execute("COMMIT")
     
     def create_migration_table(self):
         create_new = """
@@ -183,6 +239,9 @@ class MigrationState(object):
         return [m for m in migrations if not self.is_applied(m)]
     
     def plan(self, action, *args):
+        # Every plan starts from a fresh copy of the applied set
+        self._applied = None
+        
         if action in ['all', 'up', 'down'] and len(args) > 0:
             raise Exception(u"Too many arguments")
         
@@ -297,3 +297,45 @@ class MigrationStateTest(TestCase):
     si.mark_as_applied('009_bogus')
 
     self.assert_equal(['001_foo', '005_omg', '009_bogus'], si.all_migrations_applied())
+
+  def test_plan_reads_applied_migrations_once(self):
+    import dmigrations.migration_state
+    db = MigrationDb(migrations = ['001_foo', '002_bar', '005_omg', '006_hello'])
+    si = MigrationState(migration_db=db)
+    si.init()
+    si.mark_as_applied('001_foo')
+    si.mark_as_applied('005_omg')
+
+    statements = []
+    execute = dmigrations.migration_state._execute
+    def counting_execute(*sql):
+      statements.append(sql[0])
+      return execute(*sql)
+    dmigrations.migration_state._execute = counting_execute
+    try:
+      self.assert_plans(si,
+        ['all'],      [('002_bar', 'up'), ('006_hello', 'up')],
+        ['to', '2'],  [('005_omg', 'down'), ('002_bar', 'up')],
+      )
+    finally:
+      dmigrations.migration_state._execute = execute
+
+    self.assert_equal(["SELECT migration FROM dmigrations"] * 2, statements)
+
+  def test_failed_flush_is_rolled_back_and_queued_again(self):
+    import dmigrations.migration_log
+    db = MigrationDb(migrations = ['001_foo', '002_bar'])
+    si = MigrationState(migration_db=db)
+    si.init()
+
+    log_action_sql = dmigrations.migration_log.LOG_ACTION_SQL
+    dmigrations.migration_log.LOG_ACTION_SQL = "INSERT INTO no_such_table VALUES (%s, %s, %s, %s)"
+    try:
+      self.assert_raises(Exception, lambda: si.mark_as_applied('001_foo'))
+    finally:
+      dmigrations.migration_log.LOG_ACTION_SQL = log_action_sql
+
+    self.cursor.execute("SELECT migration FROM dmigrations")
+    self.assert_equal([], list(self.cursor.fetchall()))
+    si.mark_as_applied('002_bar')
+    self.assert_equal(['001_foo', '002_bar'], MigrationState(migration_db=db).all_migrations_applied())
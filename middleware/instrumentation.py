@@ -0,0 +1,198 @@
+"""
+Per-request SQL and template instrumentation.
+
+For a sample of requests (one in ``INSTRUMENTATION_SAMPLE_RATE``; 0 turns it
+off, 1 instruments every request) this middleware counts the SQL queries run,
+times them and the template rendering, and remembers the slowest statements.
+The numbers are added to the response as ``X-Django-*`` headers and folded
+into a per-URL-name summary (``game_list``, ``player_view``, ...) available
+from ``summary()`` and ``summary_view``.
+
+Requests that aren't sampled only pay for one random number and one
+thread-local lookup per template render.
+"""
+import random
+import threading
+from heapq import heappush, heappushpop
+from time import time
+
+from django.conf import settings
+from django.contrib.auth.decorators import user_passes_test
+from django.core import signals
+from django.db import connection
+from django.http import HttpResponse
+from django.template import Template
+
+from middleware.urlnames import url_name
+
+SAMPLE_RATE = getattr(settings, "INSTRUMENTATION_SAMPLE_RATE", 0)
+# how many of the slowest statements to keep per request and per URL name
+SLOWEST_COUNT = getattr(settings, "INSTRUMENTATION_SLOWEST_COUNT", 5)
+
+_state = threading.local()
+_summary = {}
+_summary_lock = threading.Lock()
+
+class RequestStats(object):
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.slowest = []
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        add_slowest(self.slowest, duration, sql)
+
+def add_slowest(slowest, duration, sql):
+    """ Keeps the SLOWEST_COUNT slowest (duration, sql) pairs in a min-heap """
+    if len(slowest) < SLOWEST_COUNT:
+        heappush(slowest, (duration, sql))
+    elif duration > slowest[0][0]:
+        heappushpop(slowest, (duration, sql))
+
+class InstrumentedCursor(object):
+    """
+    Times every statement run through a cursor. Only the SQL is kept, never
+    the parameters.
+    """
+    def __init__(self, cursor, stats):
+        self.cursor = cursor
+        self.stats = stats
+
+    def execute(self, sql, params=()):
+        start = time()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            self.stats.add_query(sql, time() - start)
+
+    def executemany(self, sql, param_list):
+        start = time()
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            self.stats.add_query(sql, time() - start)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+def instrumented_render(self, context):
+    stats = getattr(_state, "stats", None)
+    if stats is None:
+        return self._uninstrumented_render(context)
+    # only time the outermost template; includes and parents render inside it
+    stats.template_depth += 1
+    start = time()
+    try:
+        return self._uninstrumented_render(context)
+    finally:
+        stats.template_depth -= 1
+        if stats.template_depth == 0:
+            stats.template_time += time() - start
+
+if not hasattr(Template, "_uninstrumented_render"):
+    Template._uninstrumented_render = Template.render
+    Template.render = instrumented_render
+
+def record(name, stats, total):
+    _summary_lock.acquire()
+    try:
+        entry = _summary.setdefault(name, {"requests": 0, "queries": 0, "db_time": 0.0, "template_time": 0.0, "total_time": 0.0, "slowest": []})
+        entry["requests"] += 1
+        entry["queries"] += stats.queries
+        entry["db_time"] += stats.db_time
+        entry["template_time"] += stats.template_time
+        entry["total_time"] += total
+        for duration, sql in stats.slowest:
+            add_slowest(entry["slowest"], duration, sql)
+    finally:
+        _summary_lock.release()
+
+def summary():
+    """
+    Returns a dict mapping URL names to the totals for this process: number
+    of sampled ``requests``, ``queries``, ``db_time``, ``template_time``,
+    ``total_time`` and the ``slowest`` (duration, sql) pairs, slowest first
+    """
+    _summary_lock.acquire()
+    try:
+        result = {}
+        for name, entry in _summary.items():
+            result[name] = dict(entry)
+            result[name]["slowest"] = sorted(entry["slowest"], reverse=True)
+        return result
+    finally:
+        _summary_lock.release()
+
+def reset():
+    _summary_lock.acquire()
+    try:
+        _summary.clear()
+    finally:
+        _summary_lock.release()
+
+def summary_view(request):
+    """
+    Plain text report of the summary, slowest URL names first
+    """
+    lines = []
+    entries = sorted(summary().items(), key=lambda item: item[1]["total_time"], reverse=True)
+    for name, entry in entries:
+        requests = entry["requests"]
+        lines.append("%s: %d requests, %.1f queries, %.4fs db, %.4fs templates, %.4fs total (per request)" % (
+            name, requests, float(entry["queries"]) / requests, entry["db_time"] / requests, entry["template_time"] / requests, entry["total_time"] / requests))
+        for duration, sql in entry["slowest"]:
+            lines.append("    %.4fs %s" % (duration, sql))
+    return HttpResponse("\n".join(lines), mimetype="text/plain")
+summary_view = user_passes_test(lambda user: user.is_superuser)(summary_view)
+
+def uninstall(**kwargs):
+    """
+    Stops instrumenting this thread's request. Also connected to
+    request_finished, which is sent even when a later middleware's
+    process_response raises and ours never runs.
+    """
+    _state.stats = None
+    if "cursor" in connection.__dict__:
+        del connection.cursor
+signals.request_finished.connect(uninstall)
+
+class InstrumentationMiddleware(object):
+    def process_request(self, request):
+        if not SAMPLE_RATE or random.randint(1, SAMPLE_RATE) != 1:
+            return
+        stats = RequestStats()
+        request._instrumentation = (stats, time())
+        _state.stats = stats
+        # the connection object is thread local, so this only affects this request
+        cursor = connection.__class__.cursor
+        connection.cursor = lambda: InstrumentedCursor(cursor(connection), stats)
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if hasattr(request, "_instrumentation"):
+            request._instrumentation_view = callback
+
+    def process_response(self, request, response):
+        if not hasattr(request, "_instrumentation"):
+            return response
+        stats, start = request._instrumentation
+        del request._instrumentation
+        uninstall()
+        total = time() - start
+
+        response["X-Django-Query-Count"] = str(stats.queries)
+        response["X-Django-DB-Time"] = "%fs" % stats.db_time
+        response["X-Django-Template-Time"] = "%fs" % stats.template_time
+        if stats.slowest:
+            response["X-Django-Slowest-Query-Time"] = "%fs" % max(stats.slowest)[0]
+
+        callback = getattr(request, "_instrumentation_view", None)
+        if callback is not None:
+            record(url_name(callback), stats, total)
+        return response
@@ -1,21 +1,59 @@
+import os
 import sys
+import random
+import tempfile
 import cProfile
+from time import time
 from cStringIO import StringIO
 from django.conf import settings
 
+from middleware.urlnames import url_name
+
+# profile one in this many requests outside of DEBUG (0 is off) and write the
+# cProfile dumps to PROFILER_SPOOL_DIR/<url name>/; "manage.py profile_report"
+# merges them
+SAMPLE_RATE = getattr(settings, "PROFILER_SAMPLE_RATE", 0)
+SPOOL_DIR = getattr(settings, "PROFILER_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "django-profiles"))
+
 class ProfilerMiddleware(object):
     def process_view(self, request, callback, callback_args, callback_kwargs):
         if settings.DEBUG and 'prof' in request.GET:
-            self.profiler = cProfile.Profile()
-            args = (request,) + callback_args
-            return self.profiler.runcall(callback, *args, **callback_kwargs)
+            request._profiler = cProfile.Profile()
+        elif SAMPLE_RATE and random.randint(1, SAMPLE_RATE) == 1:
+            request._profiler = cProfile.Profile()
+            request._profiler_url_name = url_name(callback)
+        else:
+            return None
+        args = (request,) + callback_args
+        return request._profiler.runcall(callback, *args, **callback_kwargs)
 
     def process_response(self, request, response):
-        if settings.DEBUG and 'prof' in request.GET:
-            self.profiler.create_stats()
-            out = StringIO()
-            old_stdout, sys.stdout = sys.stdout, out
-            self.profiler.print_stats(1)
-            sys.stdout = old_stdout
-            response.content = '<pre>%s</pre>' % out.getvalue()
+        profiler = getattr(request, "_profiler", None)
+        if profiler is None:
+            return response
+        del request._profiler
+        profiler.create_stats()
+        if hasattr(request, "_profiler_url_name"):
+            spool(profiler, request._profiler_url_name)
+            return response
+        out = StringIO()
+        old_stdout, sys.stdout = sys.stdout, out
+        profiler.print_stats(1)
+        sys.stdout = old_stdout
+        response.content = '<pre>%s</pre>' % out.getvalue()
         return response
+
+def spool(profiler, name):
+    """
+    Writes the stats of ``profiler`` to a new file in the spool directory of
+    the URL name ``name``
+    """
+    directory = os.path.join(SPOOL_DIR, name.replace(os.sep, "_"))
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # another process created it first
+            pass
+    filename = "%d-%d-%06d.prof" % (time() * 1000, os.getpid(), random.randint(0, 999999))
+    profiler.dump_stats(os.path.join(directory, filename))
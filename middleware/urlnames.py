@@ -0,0 +1,31 @@
+"""
+Names of the URL patterns views are served by, for grouping per-view
+numbers. Importing this module has no side effects.
+"""
+from django.core import urlresolvers
+
+_url_names = None
+
+def url_name(callback):
+    """
+    Returns the name of the URL pattern that maps to ``callback``, falling
+    back to the view's dotted path for unnamed patterns
+    """
+    global _url_names
+    if _url_names is None:
+        names = {}
+        def walk(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, urlresolvers.RegexURLResolver):
+                    walk(pattern.url_patterns)
+                elif pattern.name:
+                    try:
+                        names.setdefault(pattern.callback, pattern.name)
+                    except (ImportError, AttributeError, urlresolvers.ViewDoesNotExist):
+                        pass
+        walk(urlresolvers.get_resolver(None).url_patterns)
+        _url_names = names
+    name = _url_names.get(callback)
+    if name is None:
+        name = "%s.%s" % (getattr(callback, "__module__", "?"), getattr(callback, "__name__", callback.__class__.__name__))
+    return name
@@ -0,0 +1,30 @@
+from dmigrations.mysql import migrations as m
+
+class NormalizeDontSendEntries(m.Migration):
+    """
+    Lower-cases the addresses on django_mailer's don't send list (now
+    normalized on save and compared in memory), dropping the duplicates that
+    leaves, and adds the unique index on to_address if syncdb didn't.
+    Normalized addresses can't be restored, so down() leaves them alone.
+    """
+    def __init__(self):
+        super(NormalizeDontSendEntries, self).__init__(sql_up=[
+            """DELETE newer FROM django_mailer_dontsendentry newer
+                JOIN django_mailer_dontsendentry older
+                ON LOWER(TRIM(newer.to_address)) = LOWER(TRIM(older.to_address)) AND newer.id > older.id""",
+            "UPDATE django_mailer_dontsendentry SET to_address = LOWER(TRIM(to_address))",
+        ])
+    
+    def up(self):
+        super(NormalizeDontSendEntries, self).up()
+        unique_indexes = self.execute_sql(
+            "SHOW INDEX FROM django_mailer_dontsendentry WHERE Column_name = 'to_address' AND Non_unique = 0",
+            return_rows=True,
+        )
+        if not unique_indexes:
+            self.execute_sql("CREATE UNIQUE INDEX django_mailer_dontsendentry_to_address ON django_mailer_dontsendentry (to_address)")
+    
+    def down(self):
+        pass
+
+migration = NormalizeDontSendEntries()
@@ -0,0 +1,8 @@
+from dmigrations.mysql import migrations as m
+import datetime
+# the queue is always read in (priority, when_added) order
+migration = m.Migration(sql_up=[
+    "CREATE INDEX `django_mailer_message_priority_when_added` ON `django_mailer_message` (`priority`, `when_added`);",
+], sql_down=[
+    "ALTER TABLE django_mailer_message DROP INDEX `django_mailer_message_priority_when_added`;",
+])
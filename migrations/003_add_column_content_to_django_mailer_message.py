@@ -0,0 +1,4 @@
+from dmigrations.mysql import migrations as m
+import datetime
+# django_mailer_messagecontent itself is a new table, created by syncdb
+migration = m.AddColumn('django_mailer', 'message', 'content', 'integer NULL', 'django_mailer_messagecontent')
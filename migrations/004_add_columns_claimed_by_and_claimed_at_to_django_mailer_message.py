@@ -0,0 +1,7 @@
+from dmigrations.mysql import migrations as m
+import datetime
+migration = m.Compound([
+    m.AddColumn('django_mailer', 'message', 'claimed_by', 'varchar(32) NULL'),
+    m.AddColumn('django_mailer', 'message', 'claimed_at', 'datetime NULL'),
+    m.AddIndex('django_mailer', 'message', 'claimed_by'),
+])
@@ -0,0 +1,6 @@
+from dmigrations.mysql import migrations as m
+import datetime
+migration = m.Compound([
+    m.AddColumn('django_mailer', 'messagelog', 'message_hash', "varchar(40) NOT NULL DEFAULT ''"),
+    m.AddIndex('django_mailer', 'messagelog', 'when_attempted'),
+])
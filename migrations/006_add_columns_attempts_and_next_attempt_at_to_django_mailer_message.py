@@ -0,0 +1,7 @@
+from dmigrations.mysql import migrations as m
+import datetime
+# existing rows get no attempts and no next attempt, so they stay eligible
+migration = m.Compound([
+    m.AddColumn('django_mailer', 'message', 'attempts', 'integer UNSIGNED NOT NULL DEFAULT 0'),
+    m.AddColumn('django_mailer', 'message', 'next_attempt_at', 'datetime NULL'),
+])
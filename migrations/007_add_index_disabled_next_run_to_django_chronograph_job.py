@@ -0,0 +1,8 @@
+from dmigrations.mysql import migrations as m
+import datetime
+# Job.objects.due() looks up (disabled, next_run)
+migration = m.Migration(sql_up=[
+    "CREATE INDEX `django_chronograph_job_disabled_next_run` ON `django_chronograph_job` (`disabled`, `next_run`);",
+], sql_down=[
+    "ALTER TABLE django_chronograph_job DROP INDEX `django_chronograph_job_disabled_next_run`;",
+])
@@ -0,0 +1,12 @@
+from dmigrations.mysql import migrations as m
+import datetime
+# existing jobs count as updated now, so a running cron_daemon reads them
+migration = m.Compound([
+    m.AddColumn('django_chronograph', 'job', 'updated_on', 'datetime NOT NULL'),
+    m.Migration(sql_up=[
+        "UPDATE `django_chronograph_job` SET `updated_on` = NOW();",
+    ], sql_down=[
+        "SELECT 1;",
+    ]),
+    m.AddIndex('django_chronograph', 'job', 'updated_on'),
+])
@@ -0,0 +1,20 @@
+from dmigrations.mysql import migrations as m
+
+class RebuildPlayerSeasonTotals(m.Migration):
+    """
+    Fills in softball's player totals table (created by syncdb) from the
+    stats entered before it existed, since the player pages and ``Player``
+    stat properties only read the totals. Same as ``manage.py
+    rebuild_player_totals``; down() leaves the rows alone.
+    """
+    def __init__(self):
+        super(RebuildPlayerSeasonTotals, self).__init__(sql_up=[])
+    
+    def up(self):
+        from softball.models import PlayerSeasonTotals
+        PlayerSeasonTotals.objects.rebuild()
+    
+    def down(self):
+        pass
+
+migration = RebuildPlayerSeasonTotals()
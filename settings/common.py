@@ -41,6 +41,7 @@ TEMPLATE_CONTEXT_PROCESSORS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    "middleware.instrumentation.InstrumentationMiddleware",
     # "middleware.profiler.ProfilerMiddleware",
     # "middleware.debug.DebugFooter",
     "django.middleware.common.CommonMiddleware",
@@ -60,6 +61,12 @@ DEFAULT_FROM_EMAIL = "no-reply@sociabledesign.com"
 LOGIN_REDIRECT_URL = "/"
 INTERNAL_IPS = ("127.0.0.1")
 
+# instrument one in this many requests with middleware.instrumentation (0 is off)
+INSTRUMENTATION_SAMPLE_RATE = 0
+# profile one in this many requests with middleware.profiler (0 is off); see
+# "manage.py profile_report"
+PROFILER_SAMPLE_RATE = 0
+
 DMIGRATIONS_DIR = os.path.join(PROJECT_PATH, "migrations")
 
 INSTALLED_APPS = (
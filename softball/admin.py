@@ -19,3 +19,8 @@ class StatisticAdmin(admin.ModelAdmin):
     ordering = ("created_on", )
     list_display = ("player", "game", "at_bats", "runs", "hits", "doubles", "triples", "home_runs", "rbis", "walks", )
 admin.site.register(Statistic, StatisticAdmin)
+
+class PlayerSeasonTotalsAdmin(admin.ModelAdmin):
+    ordering = ("player", "season", )
+    list_display = ("player", "season", "games", "at_bats", "runs", "singles", "doubles", "triples", "home_runs", "rbis", "walks", )
+admin.site.register(PlayerSeasonTotals, PlayerSeasonTotalsAdmin)
@@ -1,8 +1,40 @@
 from softball.models import *
 
+class LazyRecordCount(object):
+    """
+    One count of the win/loss/tie record. The record isn't fetched until a
+    template actually renders or compares one of the counts.
+    """
+    def __init__(self, record, key):
+        self.record = record
+        self.key = key
+    
+    def _value(self):
+        if self.record.get("counts") is None:
+            self.record["counts"] = Game.objects.record()
+        return self.record["counts"][self.key]
+    
+    def __int__(self):
+        return self._value()
+    
+    def __unicode__(self):
+        return unicode(self._value())
+    
+    def __str__(self):
+        return str(self._value())
+    
+    def __repr__(self):
+        return repr(self._value())
+    
+    def __nonzero__(self):
+        return bool(self._value())
+    
+    def __eq__(self, other):
+        return self._value() == other
+    
+    def __ne__(self, other):
+        return self._value() != other
+
 def game_record(request):
-    games = Game.objects.all()
-    wins = sum(map(lambda game: int(game.score > game.opponent_score), games))
-    losses = sum(map(lambda game: int(game.score < game.opponent_score), games))
-    ties = sum(map(lambda game: int(game.score == game.opponent_score), games))
-    return {"wins": wins, "losses": losses, "ties": ties, }
\ No newline at end of file
+    record = {}
+    return {"wins": LazyRecordCount(record, "wins"), "losses": LazyRecordCount(record, "losses"), "ties": LazyRecordCount(record, "ties"), }
@@ -0,0 +1,166 @@
+"""
+Team leaders in each stat category.
+
+``leaderboard`` keeps every player's career totals in memory along with one
+sorted index per category, built from the career ``PlayerSeasonTotals`` rows
+with a single query. When a ``Statistic`` changes only that player is
+re-read and moved within each index. Changes made by other processes are
+noticed through a version token kept in the cache, which makes the next read
+rebuild the indexes.
+
+Use ``leaderboard.top("home_runs", 5)`` for a single category or
+``leaderboard.leaders()`` for all of them.
+"""
+import threading
+import uuid
+from bisect import insort
+
+from django.conf import settings
+from django.core.cache import cache
+
+from softball.models import PlayerSeasonTotals, batch_rate_stats
+
+# the rate stats only rank players with at least this many at bats
+LEADERS_MIN_AT_BATS = getattr(settings, "LEADERS_MIN_AT_BATS", 10)
+LEADERS_VERSION_CACHE_KEY = "softball.leaders_version"
+
+CATEGORIES = (
+    ("average", "Avg"),
+    ("on_base_percentage", "OBP"),
+    ("slugging_percentage", "SLUG"),
+    ("hits", "H"),
+    ("home_runs", "HR"),
+    ("rbis", "RBI"),
+    ("runs", "R"),
+    ("walks", "BB"),
+)
+RATE_CATEGORIES = ("average", "on_base_percentage", "slugging_percentage", )
+
+def _player_rows(careers):
+    """
+    Turns career ``PlayerSeasonTotals`` rows (with their players selected)
+    into dicts holding the player's name, counting stats and rate stats
+    """
+    rows = []
+    for career in careers:
+        row = career.totals()
+        row["id"] = career.player_id
+        row["first_name"] = career.player.first_name
+        row["last_name"] = career.player.last_name
+        row["number"] = career.player.number
+        rows.append(row)
+    columns = [[row[stat] for row in rows] for stat in ("at_bats", "hits", "walks", "doubles", "triples", "home_runs")]
+    for category, rates in zip(RATE_CATEGORIES, batch_rate_stats(*columns)):
+        for row, rate in zip(rows, rates):
+            row[category] = rate
+    return rows
+
+class Leaderboard(object):
+    def __init__(self, min_at_bats=LEADERS_MIN_AT_BATS):
+        self.min_at_bats = min_at_bats
+        self.lock = threading.Lock()
+        self.version = None
+        self.players = {}
+        self.indexes = {}
+
+    def _key(self, category, row):
+        return (-row[category], row["last_name"], row["first_name"], row["id"])
+
+    def _qualifies(self, category, row):
+        if category in RATE_CATEGORIES:
+            # rates are None for invalid stats (more hits than at bats)
+            return row["at_bats"] >= self.min_at_bats and row[category] is not None
+        return row[category] > 0
+
+    def _index(self, row):
+        for category, name in CATEGORIES:
+            if self._qualifies(category, row):
+                self.indexes[category].append((self._key(category, row), row["id"]))
+
+    def _unindex(self, row):
+        for category, name in CATEGORIES:
+            if self._qualifies(category, row):
+                self.indexes[category].remove((self._key(category, row), row["id"]))
+
+    def build(self):
+        """
+        Rebuilds every index from the career totals table
+        """
+        version = cache.get(LEADERS_VERSION_CACHE_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(LEADERS_VERSION_CACHE_KEY, version)
+        careers = PlayerSeasonTotals.objects.filter(season__isnull=True).select_related("player")
+        self.players = dict([(row["id"], row) for row in _player_rows(careers)])
+        self.indexes = dict([(category, []) for category, name in CATEGORIES])
+        for row in self.players.values():
+            self._index(row)
+        for index in self.indexes.values():
+            index.sort()
+        self.version = version
+
+    def player_changed(self, player_id):
+        """
+        Re-reads a single player's career totals and moves them within each
+        index. Called whenever one of the player's stats changes.
+        """
+        self.lock.acquire()
+        try:
+            in_sync = self.version is not None and self.version == cache.get(LEADERS_VERSION_CACHE_KEY)
+            version = uuid.uuid4().hex
+            cache.set(LEADERS_VERSION_CACHE_KEY, version)
+            if not in_sync:
+                # rebuilt from scratch on the next read
+                self.version = None
+                return
+            if player_id in self.players:
+                self._unindex(self.players.pop(player_id))
+            careers = PlayerSeasonTotals.objects.filter(player=player_id, season__isnull=True).select_related("player")
+            for row in _player_rows(careers):
+                self.players[player_id] = row
+                for category, name in CATEGORIES:
+                    if self._qualifies(category, row):
+                        insort(self.indexes[category], (self._key(category, row), player_id))
+            self.version = version
+        finally:
+            self.lock.release()
+
+    def invalidate(self):
+        """
+        Makes every process rebuild its indexes on the next read
+        """
+        self.lock.acquire()
+        try:
+            cache.set(LEADERS_VERSION_CACHE_KEY, uuid.uuid4().hex)
+            self.version = None
+        finally:
+            self.lock.release()
+
+    def top(self, category, count=10):
+        """
+        Returns the rows of the (at most) ``count`` leaders in ``category``,
+        best first. Rate categories only include players with at least
+        ``min_at_bats`` at bats.
+        """
+        self.lock.acquire()
+        try:
+            if self.version is None or self.version != cache.get(LEADERS_VERSION_CACHE_KEY):
+                self.build()
+            return [self.players[player_id] for key, player_id in self.indexes[category][:count]]
+        finally:
+            self.lock.release()
+
+    def leaders(self, count=10):
+        """
+        Returns a list with a dict for every category holding its
+        ``category``, ``name``, whether it is a ``rate`` stat, and its
+        ``leaders`` as ``(value, row)`` pairs
+        """
+        return [{
+            "category": category,
+            "name": name,
+            "rate": category in RATE_CATEGORIES,
+            "leaders": [(row[category], row) for row in self.top(category, count)],
+        } for category, name in CATEGORIES]
+
+leaderboard = Leaderboard()
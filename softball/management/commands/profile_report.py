@@ -0,0 +1,39 @@
+import os
+import pstats
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--sort', action='store', dest='sort', default='cumulative',
+            help='pstats sort key for the report (default: cumulative).'),
+        make_option('--limit', action='store', dest='limit', type='int', default=30,
+            help='Number of functions to show per URL name (default: 30).'),
+        make_option('--clear', action='store_true', dest='clear', default=False,
+            help='Delete the dumps once they have been merged.'),
+    )
+    help = "Merges the cProfile dumps spooled by middleware.profiler.ProfilerMiddleware into one report per URL name."
+    args = '[URL name ...]'
+
+    def handle(self, *names, **options):
+        from middleware.profiler import SPOOL_DIR
+        if not os.path.isdir(SPOOL_DIR):
+            raise CommandError("No profiles have been spooled to %s" % SPOOL_DIR)
+        if not names:
+            names = sorted(os.listdir(SPOOL_DIR))
+        for name in names:
+            directory = os.path.join(SPOOL_DIR, name)
+            if not os.path.isdir(directory):
+                raise CommandError("No profiles have been spooled for %s" % name)
+            dumps = [os.path.join(directory, filename) for filename in sorted(os.listdir(directory)) if filename.endswith(".prof")]
+            if not dumps:
+                continue
+            print "=" * 72
+            print "%s (%d requests)" % (name, len(dumps))
+            print "=" * 72
+            stats = pstats.Stats(*dumps)
+            stats.sort_stats(options['sort']).print_stats(options['limit'])
+            if options['clear']:
+                for dump in dumps:
+                    os.remove(dump)
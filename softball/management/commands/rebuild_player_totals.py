@@ -0,0 +1,12 @@
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+
+class Command(NoArgsCommand):
+    help = "Rebuilds the PlayerSeasonTotals table from the Statistic table."
+
+    def handle_noargs(self, **options):
+        from softball.leaders import leaderboard
+        from softball.models import PlayerSeasonTotals
+        count = transaction.commit_on_success(PlayerSeasonTotals.objects.rebuild)()
+        leaderboard.invalidate()
+        print "%s player totals rows rebuilt" % count
@@ -1,6 +1,26 @@
 from decimal import Decimal
 
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import Count, Sum
+from django.db.models.query import QuerySet
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# the per-game counting stats stored on each Statistic row
+COUNTING_STATS = ("at_bats", "runs", "singles", "doubles", "triples", "home_runs", "rbis", "walks", )
+
+# the win/loss/tie record is invalidated whenever a Game changes, so it can be
+# cached for a long time; use a shared CACHE_BACKEND when running several processes.
+# Only Game.save() and Game.delete() send the signals that invalidate it: after
+# changing scores with QuerySet.update() (or raw SQL) call
+# cache.delete(GAME_RECORD_CACHE_KEY) yourself
+GAME_RECORD_CACHE_KEY = "softball.game_record"
+GAME_RECORD_CACHE_TIMEOUT = getattr(settings, "GAME_RECORD_CACHE_TIMEOUT", 60 * 60)
 
 def average(at_bats, hits):
     """
@@ -72,14 +92,161 @@ def slugging_percentage(at_bats, hits, doubles, triples, home_runs):
     if at_bats == 0:
         return Decimal("0")
     return Decimal(hits + (2 * doubles) + (3 * triples) + (4 * home_runs)) / Decimal(at_bats)
+
+def batch_rate_stats(at_bats, hits, walks, doubles, triples, home_runs):
+    """
+    Computes the average, on base percentage and slugging percentage of many
+    players at once. Takes one sequence per stat (``hits`` being total hits,
+    as in ``Player.hits``) with one entry per player, and returns a tuple of
+    three lists of floats ``(averages, on_base_percentages,
+    slugging_percentages)``. Uses numpy when it is installed.
+
+    A player whose stats are invalid (more hits than at bats) gets ``None``
+    for every rate, without affecting the others.
+
+    >>> averages, obps, slgs = batch_rate_stats([0, 4, 4, 8], [0, 1, 2, 8], [3, 2, 0, 0], [0, 0, 1, 2], [0, 0, 0, 2], [0, 0, 1, 2])
+    >>> averages
+    [0.0, 0.25, 0.5, 1.0]
+    >>> obps
+    [0.0, 0.5, 0.5, 1.0]
+    >>> slgs
+    [0.0, 0.25, 1.5, 2.5]
+
+    Hits cannot be greater than at bats
+    >>> batch_rate_stats([1, 4], [2, 2], [0, 0], [0, 0], [0, 0], [0, 0])
+    ([None, 0.5], [None, 0.5], [None, 0.5])
+    """
+    if numpy is not None:
+        ab, h, bb = numpy.asarray(at_bats, dtype=float), numpy.asarray(hits, dtype=float), numpy.asarray(walks, dtype=float)
+        total_bases = h + numpy.asarray(doubles, dtype=float) + 2 * numpy.asarray(triples, dtype=float) + 3 * numpy.asarray(home_runs, dtype=float)
+        # every rate is 0 without at bats; divide by 1 there to avoid warnings
+        played = ab > 0
+        divisor = numpy.where(played, ab, 1)
+        averages = numpy.where(played, h / divisor, 0)
+        on_base_percentages = numpy.where(played, (h + bb) / (divisor + bb), 0)
+        slugging_percentages = numpy.where(played, total_bases / divisor, 0)
+        results = averages.tolist(), on_base_percentages.tolist(), slugging_percentages.tolist()
+        for i in numpy.flatnonzero(h > ab):
+            for rates in results:
+                rates[i] = None
+        return results
     
+    averages, on_base_percentages, slugging_percentages = [], [], []
+    for ab, h, bb, d, t, hr in zip(at_bats, hits, walks, doubles, triples, home_runs):
+        if h > ab:
+            averages.append(None)
+            on_base_percentages.append(None)
+            slugging_percentages.append(None)
+        elif ab == 0:
+            averages.append(0.0)
+            on_base_percentages.append(0.0)
+            slugging_percentages.append(0.0)
+        else:
+            averages.append(float(h) / ab)
+            on_base_percentages.append(float(h + bb) / (ab + bb))
+            slugging_percentages.append(float(h + d + 2 * t + 3 * hr) / ab)
+    return averages, on_base_percentages, slugging_percentages
+
+def add_rate_stats(totals):
+    """
+    Adds ``average``, ``on_base_percentage`` and ``slugging_percentage`` to a
+    dict of counting stat totals (as returned by ``Player.totals``) and
+    returns it
+    """
+    totals["average"] = average(totals["at_bats"], totals["hits"])
+    totals["on_base_percentage"] = on_base_percentage(totals["at_bats"], totals["walks"], totals["hits"])
+    totals["slugging_percentage"] = slugging_percentage(totals["at_bats"], totals["singles"], totals["doubles"], totals["triples"], totals["home_runs"])
+    return totals
+
+def statistic_totals(statistics):
+    """
+    Sums already fetched ``Statistic`` rows into a dict of counting stat
+    totals, ``hits``, ``games`` and rate stats, without touching the database
+
+    >>> totals = statistic_totals([Statistic(at_bats=4, singles=1, walks=1), Statistic(at_bats=4, home_runs=1, rbis=2)])
+    >>> totals["games"], totals["at_bats"], totals["hits"], totals["rbis"]
+    (2, 8, 2, 2)
+    >>> totals["average"], totals["slugging_percentage"]
+    (Decimal("0.25"), Decimal("0.625"))
+    >>> statistic_totals([])["average"]
+    Decimal("0")
+    """
+    totals = dict([(stat, 0) for stat in COUNTING_STATS])
+    for statistic in statistics:
+        for stat in COUNTING_STATS:
+            totals[stat] += getattr(statistic, stat)
+    totals["games"] = len(statistics)
+    totals["hits"] = totals["singles"] + totals["doubles"] + totals["triples"] + totals["home_runs"]
+    return add_rate_stats(totals)
+
+class PlayerQuerySet(QuerySet):
+    def with_totals(self):
+        """
+        Annotates every player with the career total of each counting stat
+        (``total_at_bats``, ``total_runs``, ...) and the number of games
+        played (``total_games``), computed with a single grouped query.
+
+        >>> from datetime import date
+        >>> g1, created = Game.objects.get_or_create(game_date=date(2009, 01, 01), score=5, opponent_score=1, opponent="Test Opponent 1")
+        >>> g2, created = Game.objects.get_or_create(game_date=date(2009, 02, 01), score=2, opponent_score=3, opponent="Test Opponent 2")
+        >>> p, created = Player.objects.get_or_create(first_name="Test", last_name="Player")
+        >>> Statistic(player=p, game=g1, at_bats=3, singles=1, walks=1).save()
+        >>> Statistic(player=p, game=g2, at_bats=4, doubles=1, home_runs=1).save()
+        >>> p = Player.objects.with_totals().get(pk=p.id)
+        >>> p.total_games, p.total_at_bats, p.total_walks
+        (2, 7, 1)
+        >>> p.hits, p.games_played
+        (3, 2)
+
+        Players without any stats get zero totals
+        >>> p2, created = Player.objects.get_or_create(first_name="Other", last_name="Player")
+        >>> p2 = Player.objects.with_totals().get(pk=p2.id)
+        >>> p2.hits, p2.games_played, p2.average
+        (0, 0, Decimal("0"))
+
+        Make sure we clean up from these tests
+        >>> Statistic.objects.all().delete()
+        >>> Game.objects.all().delete()
+        >>> Player.objects.all().delete()
+        """
+        annotations = dict([("total_%s" % stat, Sum("stats__%s" % stat)) for stat in COUNTING_STATS])
+        return self.annotate(total_games=Count("stats"), **annotations)
+
+    def stat_rows(self):
+        """
+        Returns a list with one dict per player holding the player's ``id``,
+        name, ``number``, ``games_played``, every counting stat and the rate
+        stats, built from the career ``PlayerSeasonTotals`` rows with two
+        queries no matter how many players there are.
+        """
+        players = list(self.values("id", "first_name", "last_name", "number"))
+        careers = PlayerSeasonTotals.objects.filter(player__in=[player["id"] for player in players], season__isnull=True)
+        totals = dict([(career.player_id, career.totals()) for career in careers])
+        for player in players:
+            player_totals = totals.get(player["id"]) or PlayerSeasonTotals().totals()
+            player.update(add_rate_stats(player_totals))
+            player["games_played"] = player_totals["games"]
+        return players
+
+class PlayerManager(models.Manager):
+    def get_query_set(self):
+        return PlayerQuerySet(self.model)
+
+    def with_totals(self):
+        return self.get_query_set().with_totals()
+
+    def stat_rows(self):
+        return self.get_query_set().stat_rows()
+
 class Player(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     number = models.CharField(max_length=10, null=True, blank=True)
-    
+
+    objects = PlayerManager()
+
     class Meta:
         unique_together = ("first_name", "last_name")
         ordering = ["last_name", "first_name", ]
@@ -97,7 +264,32 @@ class Player(models.Model):
             return "%s %s (#%s)" % (self.first_name, self.last_name, self.number, )
         else:
             return "%s %s" % (self.first_name, self.last_name, )
-    
+
+    def totals(self):
+        """
+        Returns a dict of the career total of every counting stat, plus
+        ``hits`` and ``games``. Reads the annotations added by
+        ``Player.objects.with_totals()`` or the career totals attached by
+        ``PlayerSeasonTotals.objects.attach_career_totals()`` when present,
+        otherwise looks up the player's career ``PlayerSeasonTotals`` row.
+        """
+        if hasattr(self, "total_games"):
+            totals = dict([(stat, getattr(self, "total_%s" % stat) or 0) for stat in COUNTING_STATS])
+            totals["games"] = self.total_games
+            totals["hits"] = totals["singles"] + totals["doubles"] + totals["triples"] + totals["home_runs"]
+            return totals
+        career = getattr(self, "_career_totals", None)
+        if career is None:
+            career = PlayerSeasonTotals.objects.career(self)
+        return career.totals()
+
+    def _games_played_get(self):
+        """
+        Returns the number of games this player has stats for
+        """
+        return self.totals()["games"]
+    games_played = property(_games_played_get)
+
     def _hits_get(self):
         """
         Returns the total hits, doubles, triples, and home_runs
@@ -170,7 +362,7 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        return reduce(lambda total, s: total + s.hits, self.stats.all(), 0)
+        return self.totals()["hits"]
     hits = property(_hits_get)
     
     def _walks_get(self):
@@ -201,7 +393,7 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        return reduce(lambda total, s: total + s.walks, self.stats.all(), 0)
+        return self.totals()["walks"]
     walks = property(_walks_get)
     
     def _runs_get(self):
@@ -232,7 +424,7 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        return reduce(lambda total, s: total + s.runs, self.stats.all(), 0)
+        return self.totals()["runs"]
     runs = property(_runs_get)
     
     def _singles_get(self):
@@ -263,7 +455,7 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        return reduce(lambda total, s: total + s.singles, self.stats.all(), 0)
+        return self.totals()["singles"]
     singles = property(_singles_get)
 
     def _at_bats_get(self):
@@ -290,7 +482,7 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        return reduce(lambda total, s: total + s.at_bats, self.stats.all(), 0)
+        return self.totals()["at_bats"]
     at_bats = property(_at_bats_get)
     
     def _doubles_get(self):
@@ -317,7 +509,7 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        return reduce(lambda total, s: total + s.doubles, self.stats.all(), 0)
+        return self.totals()["doubles"]
     doubles = property(_doubles_get)
 
     def _triples_get(self):
@@ -344,7 +536,7 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        return reduce(lambda total, s: total + s.triples, self.stats.all(), 0)
+        return self.totals()["triples"]
     triples = property(_triples_get)
 
     def _home_runs_get(self):
@@ -371,7 +563,7 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        return reduce(lambda total, s: total + s.home_runs, self.stats.all(), 0)
+        return self.totals()["home_runs"]
     home_runs = property(_home_runs_get)
     
     def _rbis_get(self):
@@ -402,7 +594,7 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        return reduce(lambda total, s: total + s.rbis, self.stats.all(), 0)
+        return self.totals()["rbis"]
     rbis = property(_rbis_get)
     
     def _average_get(self):
@@ -438,11 +630,12 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        if len(self.stats.all()) == 0:
+        totals = self.totals()
+        if totals["games"] == 0:
             return Decimal("0")
-        if self.hits > self.at_bats:
+        if totals["hits"] > totals["at_bats"]:
             raise ValueError("hits must be <= at_bats") 
-        return average(self.at_bats, self.hits)
+        return average(totals["at_bats"], totals["hits"])
     average = property(_average_get)
     
     def _on_base_percentage_get(self):
@@ -469,9 +662,10 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        if self.hits > self.at_bats:
+        totals = self.totals()
+        if totals["hits"] > totals["at_bats"]:
             raise ValueError("hits must be <= at_bats")
-        return on_base_percentage(self.at_bats, self.walks, self.hits)
+        return on_base_percentage(totals["at_bats"], totals["walks"], totals["hits"])
     on_base_percentage = property(_on_base_percentage_get)
 
     def _slugging_percentage_get(self):
@@ -526,11 +720,30 @@ class Player(models.Model):
         >>> Game.objects.all().delete()
         >>> Player.objects.all().delete()
         """
-        if self.hits > self.at_bats:
+        totals = self.totals()
+        if totals["hits"] > totals["at_bats"]:
             raise ValueError("hits must be <= at_bats")
-        return slugging_percentage(self.at_bats, self.singles, self.doubles, self.triples, self.home_runs)
+        return slugging_percentage(totals["at_bats"], totals["singles"], totals["doubles"], totals["triples"], totals["home_runs"])
     slugging_percentage = property(_slugging_percentage_get)
 
+class GameManager(models.Manager):
+    def record(self):
+        """
+        Returns a dict with the number of ``wins``, ``losses`` and ``ties``,
+        counted with a single query and cached until a ``Game`` changes.
+        """
+        record = cache.get(GAME_RECORD_CACHE_KEY)
+        if record is None:
+            qn = connection.ops.quote_name
+            score, opponent_score = qn("score"), qn("opponent_score")
+            cursor = connection.cursor()
+            cursor.execute("SELECT SUM(CASE WHEN %s > %s THEN 1 ELSE 0 END), SUM(CASE WHEN %s < %s THEN 1 ELSE 0 END), SUM(CASE WHEN %s = %s THEN 1 ELSE 0 END) FROM %s" % (
+                score, opponent_score, score, opponent_score, score, opponent_score, qn(self.model._meta.db_table), ))
+            wins, losses, ties = [int(count or 0) for count in cursor.fetchone()]
+            record = {"wins": wins, "losses": losses, "ties": ties, }
+            cache.set(GAME_RECORD_CACHE_KEY, record, GAME_RECORD_CACHE_TIMEOUT)
+        return record
+
 class Game(models.Model):
     """
     >>> from datetime import date
@@ -592,6 +805,8 @@ class Game(models.Model):
     opponent_score = models.PositiveIntegerField()
     notes = models.TextField(blank=True, null=True)
     
+    objects = GameManager()
+    
     class Meta:
         ordering = ["game_date",]
     
@@ -885,4 +1100,219 @@ class Statistic(models.Model):
             raise ValueError("hits must be <= at_bats")
         return slugging_percentage(self.at_bats, self.singles, self.doubles, self.triples, self.home_runs)
     slugging_percentage = property(_slugging_percentage_get)
-        
\ No newline at end of file
+        
+class PlayerSeasonTotalsManager(models.Manager):
+    def apply(self, player_id, season, deltas, career=True):
+        """
+        Adds ``deltas`` (a dict of counting stat -> change, including
+        ``games``) to the season row, and the career row if ``career`` is
+        set, for the given player. Must be called after the ``Statistic``
+        table has changed, at most once per row for each change: a missing
+        row (one that was never built, e.g. for stats entered before the
+        totals table existed) is rebuilt from the ``Statistic`` table
+        instead, which already includes the change.
+        """
+        deltas = dict([(key, value) for key, value in deltas.items() if value])
+        if not deltas:
+            return
+        seasons = career and (season, None) or (season, )
+        for row_season in seasons:
+            rows = self.filter(player=player_id, season=row_season)
+            if not rows.update(**dict([(key, models.F(key) + value) for key, value in deltas.items()])):
+                self.rebuild_row(player_id, row_season)
+
+    def rebuild_row(self, player_id, season):
+        """
+        Recomputes a single totals row from the ``Statistic`` table, leaving
+        no row if the player has no stats for ``season``
+        """
+        statistics = Statistic.objects.filter(player=player_id)
+        if season is not None:
+            statistics = statistics.filter(game__game_date__year=season)
+        sums = statistics.aggregate(Count("id"), *[Sum(stat) for stat in COUNTING_STATS])
+        self.filter(player=player_id, season=season).delete()
+        if sums["id__count"]:
+            row_totals = dict([(stat, sums["%s__sum" % stat] or 0) for stat in COUNTING_STATS])
+            self.create(player_id=player_id, season=season, games=sums["id__count"], **row_totals)
+
+    def career(self, player):
+        """
+        Returns the career totals row for ``player``, or an unsaved row of
+        zeros if the player has no stats yet.
+        """
+        try:
+            return self.get(player=player, season__isnull=True)
+        except self.model.DoesNotExist:
+            return self.model(player=player, season=None)
+
+    def attach_career_totals(self, players):
+        """
+        Fetches the career totals for every player in ``players`` with a
+        single query and attaches them so that the ``Player`` stat
+        properties are read from them. Returns the players as a list.
+        """
+        players = list(players)
+        careers = dict([(row.player_id, row) for row in self.filter(player__in=[p.id for p in players], season__isnull=True)])
+        for player in players:
+            player._career_totals = careers.get(player.id, self.model(player=player, season=None))
+        return players
+
+    def rebuild(self):
+        """
+        Throws away every totals row and recomputes them from the
+        ``Statistic`` table. Returns the number of rows written.
+        """
+        self.all().delete()
+        totals = {}
+        rows = Statistic.objects.values_list("player", "game__game_date", *COUNTING_STATS)
+        for row in rows.iterator():
+            player_id, game_date, values = row[0], row[1], row[2:]
+            for season in (game_date.year, None):
+                row_totals = totals.setdefault((player_id, season), dict([(stat, 0) for stat in COUNTING_STATS + ("games", )]))
+                row_totals["games"] += 1
+                for stat, value in zip(COUNTING_STATS, values):
+                    row_totals[stat] += value
+        if totals:
+            # one executemany(), which MySQLdb sends as a multi-row INSERT
+            qn = connection.ops.quote_name
+            field_names = ("player", "season", "games") + COUNTING_STATS
+            sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+                qn(self.model._meta.db_table),
+                ", ".join([qn(self.model._meta.get_field(name).column) for name in field_names]),
+                ", ".join(["%s"] * len(field_names)), )
+            connection.cursor().executemany(sql, [
+                [player_id, season, row_totals["games"]] + [row_totals[stat] for stat in COUNTING_STATS]
+                for (player_id, season), row_totals in totals.items()])
+            transaction.commit_unless_managed()
+        return len(totals)
+
+class PlayerSeasonTotals(models.Model):
+    """
+    Denormalized sums of a player's ``Statistic`` rows for a single season
+    (the year of the game), or for their whole career when ``season`` is
+    ``None``. Kept up to date by the ``Statistic`` and ``Game`` signal
+    handlers below; ``manage.py rebuild_player_totals`` recomputes it.
+    """
+    player = models.ForeignKey(Player, related_name="season_totals")
+    season = models.PositiveIntegerField(null=True, blank=True)
+    games = models.PositiveIntegerField(default=0)
+    at_bats = models.PositiveIntegerField(default=0)
+    runs = models.PositiveIntegerField(default=0)
+    singles = models.PositiveIntegerField(default=0)
+    doubles = models.PositiveIntegerField(default=0)
+    triples = models.PositiveIntegerField(default=0)
+    home_runs = models.PositiveIntegerField(default=0)
+    rbis = models.PositiveIntegerField(default=0)
+    walks = models.PositiveIntegerField(default=0)
+
+    objects = PlayerSeasonTotalsManager()
+
+    class Meta:
+        unique_together = ("player", "season")
+        verbose_name_plural = "player season totals"
+
+    def __unicode__(self):
+        return "%s %s (G=%s, AB=%s)" % (self.player, self.season or "career", self.games, self.at_bats, )
+
+    def totals(self):
+        """
+        Returns the totals as a dict in the format of ``Player.totals``
+        """
+        totals = dict([(stat, getattr(self, stat)) for stat in COUNTING_STATS])
+        totals["games"] = self.games
+        totals["hits"] = self.singles + self.doubles + self.triples + self.home_runs
+        return totals
+
+def _statistic_deltas(statistic, sign=1):
+    deltas = dict([(stat, sign * getattr(statistic, stat)) for stat in COUNTING_STATS])
+    deltas["games"] = sign
+    return deltas
+
+def statistic_pre_save(sender, instance, **kwargs):
+    """ Remember the stored values of a Statistic that is about to change """
+    instance._stored_totals = None
+    if instance.pk:
+        try:
+            stored = Statistic.objects.select_related("game").get(pk=instance.pk)
+        except Statistic.DoesNotExist:
+            return
+        instance._stored_totals = (stored.player_id, stored.game.game_date.year, _statistic_deltas(stored, -1))
+
+def _add_deltas(changes, player_id, season, deltas, career=True):
+    """
+    Sums ``deltas`` into ``changes``, a dict of (player id, season) -> deltas,
+    for the season row and the career row, so that every totals row is only
+    applied once
+    """
+    for row_season in career and (season, None) or (season, ):
+        row_deltas = changes.setdefault((player_id, row_season), dict([(key, 0) for key in COUNTING_STATS + ("games", )]))
+        for key, value in deltas.items():
+            row_deltas[key] += value
+
+def statistic_post_save(sender, instance, **kwargs):
+    """ Apply the change in a Statistic to the player's totals """
+    changes = {}
+    if getattr(instance, "_stored_totals", None):
+        player_id, season, deltas = instance._stored_totals
+        _add_deltas(changes, player_id, season, deltas)
+    _add_deltas(changes, instance.player_id, instance.game.game_date.year, _statistic_deltas(instance))
+    for (player_id, season), deltas in changes.items():
+        PlayerSeasonTotals.objects.apply(player_id, season, deltas, career=False)
+    instance._stored_totals = None
+    from softball.leaders import leaderboard
+    for player_id in set([player_id for player_id, season in changes.keys()]):
+        leaderboard.player_changed(player_id)
+
+def statistic_pre_delete(sender, instance, **kwargs):
+    """ Look up the season while the game still exists """
+    instance._stored_totals = (instance.player_id, instance.game.game_date.year, _statistic_deltas(instance, -1))
+
+def statistic_post_delete(sender, instance, **kwargs):
+    """ Remove a deleted Statistic from the player's totals """
+    player_id, season, deltas = instance._stored_totals
+    PlayerSeasonTotals.objects.apply(player_id, season, deltas)
+    from softball.leaders import leaderboard
+    leaderboard.player_changed(player_id)
+
+def player_post_save(sender, instance, **kwargs):
+    """ Make the leaderboard pick up a changed name """
+    from softball.leaders import leaderboard
+    leaderboard.invalidate()
+
+def game_pre_save(sender, instance, **kwargs):
+    """ Remember the season of a Game whose date may change """
+    instance._stored_season = None
+    if instance.pk:
+        try:
+            instance._stored_season = Game.objects.get(pk=instance.pk).game_date.year
+        except Game.DoesNotExist:
+            pass
+
+def game_post_save(sender, instance, **kwargs):
+    """
+    Forget the cached win/loss/tie record and move the stats of a Game that
+    changed seasons to the new season
+    """
+    cache.delete(GAME_RECORD_CACHE_KEY)
+    season = instance.game_date.year
+    if instance._stored_season is None or instance._stored_season == season:
+        return
+    changes = {}
+    for statistic in instance.stats.all():
+        _add_deltas(changes, statistic.player_id, instance._stored_season, _statistic_deltas(statistic, -1), career=False)
+        _add_deltas(changes, statistic.player_id, season, _statistic_deltas(statistic), career=False)
+    for (player_id, row_season), deltas in changes.items():
+        PlayerSeasonTotals.objects.apply(player_id, row_season, deltas, career=False)
+
+def game_post_delete(sender, instance, **kwargs):
+    """ Forget the cached win/loss/tie record """
+    cache.delete(GAME_RECORD_CACHE_KEY)
+
+models.signals.pre_save.connect(statistic_pre_save, sender=Statistic)
+models.signals.post_save.connect(statistic_post_save, sender=Statistic)
+models.signals.pre_delete.connect(statistic_pre_delete, sender=Statistic)
+models.signals.post_delete.connect(statistic_post_delete, sender=Statistic)
+models.signals.post_save.connect(player_post_save, sender=Player)
+models.signals.pre_save.connect(game_pre_save, sender=Game)
+models.signals.post_save.connect(game_post_save, sender=Game)
+models.signals.post_delete.connect(game_post_delete, sender=Game)
@@ -1,11 +1,32 @@
 import unittest
 from datetime import date
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
 
 from softball.models import *
 from softball.context_processors import game_record
+from softball.leaders import leaderboard
+
+def count_queries(func, *args, **kwargs):
+    """ Returns the number of SQL queries run by calling func """
+    old_debug = settings.DEBUG
+    settings.DEBUG = True
+    connection.queries = []
+    try:
+        func(*args, **kwargs)
+        return len(connection.queries)
+    finally:
+        settings.DEBUG = old_debug
 
 class ContextProcessorTest(TestCase):
+    def setUp(self):
+        # a record cached by an earlier test survives its rollback
+        cache.delete(GAME_RECORD_CACHE_KEY)
+    
     def test_game_record(self):
         self.assertEqual(game_record(request=None), { "wins": 0, "losses": 0, "ties": 0 })
         
@@ -40,3 +61,306 @@ class ContextProcessorTest(TestCase):
         Game.objects.create(game_date=date(2009, 06, 01), score=0, opponent_score=0, opponent="Test Opponent 1")
         self.assertEqual(game_record(request=None), { "wins": 2, "losses": 2, "ties": 2 })
         Game.objects.all().delete()
+    
+    def test_game_record_is_lazy_and_cached(self):
+        Game.objects.create(game_date=date(2009, 01, 01), score=1, opponent_score=0, opponent="Test Opponent 1")
+        self.assertEqual(count_queries(game_record, request=None), 0)
+        
+        record = game_record(request=None)
+        self.assertEqual(count_queries(unicode, record["wins"]), 1)
+        self.assertEqual(count_queries(unicode, record["losses"]), 0)
+        self.assertEqual(count_queries(unicode, game_record(request=None)["ties"]), 0)
+        
+        # Saving a game invalidates the cached record
+        Game.objects.create(game_date=date(2009, 02, 01), score=0, opponent_score=1, opponent="Test Opponent 1")
+        self.assertEqual(unicode(game_record(request=None)["losses"]), u"1")
+        Game.objects.all().delete()
+
+class PlayerSeasonTotalsTest(TestCase):
+    def setUp(self):
+        self.player = Player.objects.create(first_name="Test", last_name="Player")
+        self.g1 = Game.objects.create(game_date=date(2008, 06, 01), score=1, opponent_score=0, opponent="Test Opponent 1")
+        self.g2 = Game.objects.create(game_date=date(2009, 06, 01), score=1, opponent_score=0, opponent="Test Opponent 2")
+    
+    def totals(self, season):
+        return PlayerSeasonTotals.objects.get(player=self.player, season=season).totals()
+    
+    def test_incremental_updates(self):
+        s1 = Statistic.objects.create(player=self.player, game=self.g1, at_bats=4, singles=1, home_runs=1)
+        s2 = Statistic.objects.create(player=self.player, game=self.g2, at_bats=3, doubles=1, walks=1)
+        self.assertEqual(self.totals(2008)["hits"], 2)
+        self.assertEqual(self.totals(2009)["hits"], 1)
+        self.assertEqual(self.totals(None)["at_bats"], 7)
+        self.assertEqual(self.totals(None)["games"], 2)
+        
+        # Editing a statistic applies only the difference
+        s1.at_bats = 5
+        s1.save()
+        self.assertEqual(self.totals(2008)["at_bats"], 5)
+        self.assertEqual(self.totals(None)["at_bats"], 8)
+        
+        # Moving a game to another season moves its stats
+        self.g1.game_date = date(2009, 07, 01)
+        self.g1.save()
+        self.assertEqual(self.totals(2008)["games"], 0)
+        self.assertEqual(self.totals(2009)["games"], 2)
+        self.assertEqual(self.totals(None)["games"], 2)
+        
+        s2.delete()
+        self.assertEqual(self.totals(2009)["at_bats"], 5)
+        self.assertEqual(self.totals(None)["walks"], 0)
+        self.assertEqual(self.player.at_bats, 5)
+    
+    def test_rebuild_matches_incremental(self):
+        Statistic.objects.create(player=self.player, game=self.g1, at_bats=4, singles=1, rbis=2)
+        Statistic.objects.create(player=self.player, game=self.g2, at_bats=3, triples=1, runs=1)
+        incremental = dict([(row.season, row.totals()) for row in PlayerSeasonTotals.objects.all()])
+        self.assertEqual(PlayerSeasonTotals.objects.rebuild(), 3)
+        rebuilt = dict([(row.season, row.totals()) for row in PlayerSeasonTotals.objects.all()])
+        self.assertEqual(incremental, rebuilt)
+    
+    def test_missing_rows_are_rebuilt(self):
+        s1 = Statistic.objects.create(player=self.player, game=self.g1, at_bats=4, singles=1)
+        s2 = Statistic.objects.create(player=self.player, game=self.g2, at_bats=3, doubles=1)
+        # as for stats entered before the totals table existed
+        PlayerSeasonTotals.objects.all().delete()
+        
+        s1.at_bats = 5
+        s1.save()
+        self.assertEqual(self.totals(2008)["at_bats"], 5)
+        self.assertEqual(self.totals(None)["at_bats"], 8)
+        self.assertEqual(self.totals(None)["games"], 2)
+        
+        s2.delete()
+        PlayerSeasonTotals.objects.filter(season=None).delete()
+        s1.delete()
+        self.assertEqual(self.totals(2008)["games"], 0)
+        self.assertEqual(PlayerSeasonTotals.objects.filter(player=self.player, season=2009).count(), 0)
+        # a rebuilt row without any stats isn't created
+        self.assertEqual(PlayerSeasonTotals.objects.filter(player=self.player, season__isnull=True).count(), 0)
+
+class PlayerListViewTest(TestCase):
+    def add_players(self, count):
+        game = Game.objects.create(game_date=date(2009, 01, 01), score=1, opponent_score=0, opponent="Test Opponent 1")
+        for i in range(count):
+            player = Player.objects.create(first_name="Test", last_name="Player %s" % Player.objects.count(), number=str(i))
+            Statistic.objects.create(player=player, game=game, at_bats=4, singles=1, doubles=1, walks=1)
+    
+    def list_queries(self):
+        # keep the cached game record from hiding a query in later requests
+        cache.delete(GAME_RECORD_CACHE_KEY)
+        return count_queries(self.client.get, reverse("player_list"))
+    
+    def test_stat_rows(self):
+        self.add_players(1)
+        Player.objects.create(first_name="No", last_name="Stats")
+        rows = dict([(row["last_name"], row) for row in Player.objects.stat_rows()])
+        self.assertEqual(rows["Player 0"]["games_played"], 1)
+        self.assertEqual(rows["Player 0"]["hits"], 2)
+        self.assertEqual(rows["Player 0"]["average"], Decimal("0.5"))
+        self.assertEqual(rows["Stats"]["games_played"], 0)
+        self.assertEqual(rows["Stats"]["slugging_percentage"], Decimal("0"))
+    
+    def test_query_count_is_constant(self):
+        self.add_players(2)
+        queries = self.list_queries()
+        self.add_players(20)
+        response = self.client.get(reverse("player_list"))
+        self.assertContains(response, "Player 21")
+        self.assertEqual(self.list_queries(), queries)
+
+class DetailViewTest(TestCase):
+    def setUp(self):
+        self.game = Game.objects.create(game_date=date(2009, 01, 01), score=1, opponent_score=0, opponent="Test Opponent 1")
+        self.player = Player.objects.create(first_name="Test", last_name="Player")
+    
+    def add_stats(self, count):
+        for i in range(count):
+            player = Player.objects.create(first_name="Test", last_name="Player %s" % Player.objects.count())
+            Statistic.objects.create(player=player, game=self.game, at_bats=3, singles=1)
+            game = Game.objects.create(game_date=date(2009, 02, 01), score=1, opponent_score=0, opponent="Test Opponent %s" % i)
+            Statistic.objects.create(player=self.player, game=game, at_bats=4, doubles=1, walks=1)
+    
+    def view_queries(self, name, **kwargs):
+        cache.delete(GAME_RECORD_CACHE_KEY)
+        return count_queries(self.client.get, reverse(name, kwargs=kwargs))
+    
+    def test_query_count_is_constant(self):
+        self.add_stats(2)
+        game_queries = self.view_queries("game_view", game_id=self.game.id)
+        player_queries = self.view_queries("player_view", player_id=self.player.id)
+        self.add_stats(13)
+        self.assertEqual(self.view_queries("game_view", game_id=self.game.id), game_queries)
+        self.assertEqual(self.view_queries("player_view", player_id=self.player.id), player_queries)
+    
+    def test_player_totals(self):
+        self.add_stats(3)
+        response = self.client.get(reverse("player_view", kwargs={ "player_id": self.player.id }))
+        self.assertEqual(response.context[0]["totals"]["at_bats"], 12)
+        self.assertEqual(response.context[0]["totals"]["hits"], self.player.hits)
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        leaderboard.invalidate()
+        self.game = Game.objects.create(game_date=date(2009, 01, 01), score=1, opponent_score=0, opponent="Test Opponent 1")
+        self.slugger = Player.objects.create(first_name="Test", last_name="Slugger")
+        self.rookie = Player.objects.create(first_name="Test", last_name="Rookie")
+        Statistic.objects.create(player=self.slugger, game=self.game, at_bats=20, singles=4, home_runs=3, rbis=6)
+        Statistic.objects.create(player=self.rookie, game=self.game, at_bats=2, singles=2, rbis=1)
+    
+    def ids(self, category):
+        return [row["id"] for row in leaderboard.top(category)]
+    
+    def test_top(self):
+        self.assertEqual(self.ids("rbis"), [self.slugger.id, self.rookie.id])
+        self.assertEqual(self.ids("home_runs"), [self.slugger.id])
+        # the rookie doesn't have enough at bats for the rate stats
+        self.assertEqual(self.ids("average"), [self.slugger.id])
+        self.assertEqual(leaderboard.top("average")[0]["average"], 0.35)
+    
+    def test_incremental_update(self):
+        self.assertEqual(self.ids("rbis"), [self.slugger.id, self.rookie.id])
+        game = Game.objects.create(game_date=date(2009, 02, 01), score=1, opponent_score=0, opponent="Test Opponent 2")
+        Statistic.objects.create(player=self.rookie, game=game, at_bats=10, singles=5, home_runs=4, rbis=9)
+        self.assertEqual(count_queries(leaderboard.top, "rbis"), 0)
+        self.assertEqual(self.ids("rbis"), [self.rookie.id, self.slugger.id])
+        self.assertEqual(self.ids("home_runs"), [self.rookie.id, self.slugger.id])
+        self.assertEqual(self.ids("average"), [self.rookie.id, self.slugger.id])
+        
+        self.rookie.stats.all().delete()
+        self.assertEqual(self.ids("rbis"), [self.slugger.id])
+    
+    def test_view(self):
+        response = self.client.get(reverse("leader_list"))
+        self.assertContains(response, "Slugger")
+    
+    def test_invalid_stats_only_drop_that_player(self):
+        broken = Player.objects.create(first_name="Test", last_name="Broken")
+        Statistic.objects.create(player=broken, game=self.game, at_bats=10, singles=12, rbis=20)
+        self.assertEqual(self.ids("average"), [self.slugger.id])
+        self.assertEqual(self.ids("rbis"), [broken.id, self.slugger.id, self.rookie.id])
+        response = self.client.get(reverse("leader_list"))
+        self.assertContains(response, "Slugger")
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        from middleware import instrumentation
+        self.instrumentation = instrumentation
+        self.old_sample_rate = instrumentation.SAMPLE_RATE
+        instrumentation.SAMPLE_RATE = 1
+        instrumentation.reset()
+        cache.delete(GAME_RECORD_CACHE_KEY)
+        Player.objects.create(first_name="Test", last_name="Player")
+    
+    def tearDown(self):
+        self.instrumentation.SAMPLE_RATE = self.old_sample_rate
+        self.instrumentation.reset()
+    
+    def test_counts_queries_and_templates(self):
+        old_debug = settings.DEBUG
+        settings.DEBUG = True
+        connection.queries = []
+        try:
+            response = self.client.get(reverse("player_list"))
+            queries = len(connection.queries)
+        finally:
+            settings.DEBUG = old_debug
+        self.assertEqual(int(response["X-Django-Query-Count"]), queries)
+        self.assert_(float(response["X-Django-Template-Time"].rstrip("s")) > 0)
+        summary = self.instrumentation.summary()["player_list"]
+        self.assertEqual(summary["requests"], 1)
+        self.assertEqual(summary["queries"], queries)
+        self.assert_(len(summary["slowest"]) <= self.instrumentation.SLOWEST_COUNT)
+        # the cursor is only wrapped for the duration of the request
+        self.assert_("cursor" not in connection.__dict__)
+    
+    def test_unsampled_requests_are_left_alone(self):
+        self.instrumentation.SAMPLE_RATE = 0
+        response = self.client.get(reverse("player_list"))
+        self.assertFalse(response.has_header("X-Django-Query-Count"))
+        self.assertEqual(self.instrumentation.summary(), {})
+    
+    def test_request_finished_uninstalls(self):
+        # as when a later middleware's process_response raises
+        from django.core import signals
+        from django.http import HttpRequest
+        self.instrumentation.InstrumentationMiddleware().process_request(HttpRequest())
+        self.assert_("cursor" in connection.__dict__)
+        signals.request_finished.send(sender=self.__class__)
+        self.assert_("cursor" not in connection.__dict__)
+        self.assertEqual(self.instrumentation._state.stats, None)
+    
+    def test_summary_view(self):
+        from django.contrib.auth.models import User
+        self.client.get(reverse("player_list"))
+        User.objects.create_superuser("admin", "admin@example.com", "secret")
+        self.client.login(username="admin", password="secret")
+        response = self.client.get(reverse("instrumentation_summary"))
+        self.assertContains(response, "player_list: 1 requests")
+
+def profiled_view(request):
+    from django.http import HttpResponse
+    return HttpResponse("profiled")
+
+class ProfilerTest(TestCase):
+    def setUp(self):
+        import shutil, tempfile
+        from middleware import profiler
+        self.profiler = profiler
+        self.old_settings = profiler.SAMPLE_RATE, profiler.SPOOL_DIR
+        profiler.SAMPLE_RATE = 1
+        profiler.SPOOL_DIR = tempfile.mkdtemp()
+        self.rmtree = shutil.rmtree
+    
+    def tearDown(self):
+        self.rmtree(self.profiler.SPOOL_DIR)
+        self.profiler.SAMPLE_RATE, self.profiler.SPOOL_DIR = self.old_settings
+    
+    def profile(self, debug=False, **query):
+        from django.http import HttpRequest
+        old_debug = settings.DEBUG
+        settings.DEBUG = debug
+        try:
+            request = HttpRequest()
+            request.GET = query
+            middleware = self.profiler.ProfilerMiddleware()
+            response = middleware.process_view(request, profiled_view, (), {})
+            return middleware.process_response(request, response)
+        finally:
+            settings.DEBUG = old_debug
+    
+    def dumps(self):
+        import os
+        directory = os.path.join(self.profiler.SPOOL_DIR, "softball.tests.profiled_view")
+        return os.path.isdir(directory) and os.listdir(directory) or []
+    
+    def test_sampled_requests_are_spooled(self):
+        self.assertEqual(self.profile().content, "profiled")
+        self.profile()
+        self.assertEqual(len(self.dumps()), 2)
+        
+        self.profiler.SAMPLE_RATE = 0
+        self.assertEqual(self.profile().content, "profiled")
+        self.assertEqual(len(self.dumps()), 2)
+    
+    def test_debug_mode_shows_stats(self):
+        self.profiler.SAMPLE_RATE = 0
+        response = self.profile(debug=True, prof="")
+        self.assert_(response.content.startswith("<pre>"))
+        self.assertEqual(self.dumps(), [])
+    
+    def test_profile_report(self):
+        import sys
+        from StringIO import StringIO
+        from django.core.management import call_command
+        self.profile()
+        self.profile()
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            call_command("profile_report", clear=True)
+            report = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assert_("softball.tests.profiled_view (2 requests)" in report)
+        self.assert_("profiled_view" in report.split("requests)", 1)[1])
+        self.assertEqual(self.dumps(), [])
@@ -18,5 +18,6 @@ urlpatterns = patterns("softball.views",
     url(r"^players/(?P<player_id>[0-9]+)/$", "player.view", name="player_view"),
     url(r"^players/(?P<player_id>[0-9]+)/edit/$", "player.edit", name="player_edit"),
     url(r"^players/(?P<player_id>[0-9]+)/delete/$", "player.delete", name="player_delete"),
+    url(r"^leaders/$", "leaders.list", name="leader_list"),
 )
 
@@ -16,7 +16,8 @@ def list(request):
 
 def view(request, game_id):
     game = get_object_or_404(Game, pk=game_id)
-    return render_to_response("games/view.html", { "game": game }, context_instance=RequestContext(request))
+    statistics = game.stats.select_related("player")
+    return render_to_response("games/view.html", { "game": game, "statistics": statistics }, context_instance=RequestContext(request))
 
 @login_required
 def add(request):
@@ -0,0 +1,7 @@
+from django.shortcuts import render_to_response
+from django.template import RequestContext
+
+from softball.leaders import leaderboard, LEADERS_MIN_AT_BATS
+
+def list(request):
+    return render_to_response("leaders/list.html", { "leaders": leaderboard.leaders(), "min_at_bats": LEADERS_MIN_AT_BATS }, context_instance=RequestContext(request))
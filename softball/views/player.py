@@ -12,12 +12,14 @@ from softball.models import *
 from softball.forms import *
 
 def list(request):
-    players = Player.objects.all()
+    players = Player.objects.stat_rows()
     return render_to_response("players/list.html", { "players": players }, context_instance=RequestContext(request))
 
 def view(request, player_id):
     player = get_object_or_404(Player, pk=player_id)
-    return render_to_response("players/view.html", { "player": player }, context_instance=RequestContext(request))
+    statistics = [statistic for statistic in player.stats.select_related("game")]
+    totals = statistic_totals(statistics)
+    return render_to_response("players/view.html", { "player": player, "statistics": statistics, "totals": totals }, context_instance=RequestContext(request))
 
 @login_required
 def add(request):
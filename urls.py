@@ -15,6 +15,7 @@ urlpatterns = patterns("",
     url(r"^contact/$", contact_form, name="contact_form"),
     url(r"^contact/sent/$", direct_to_template, { "template": "contact_form/contact_form_sent.html" }, name="contact_form_sent"),
 	url(r"^admin/chronograph/job/(?P<pk>\d+)/run/$", "django_chronograph.views.job_run", name="admin_chronograph_job_run"),
+    url(r"^admin/instrumentation/$", "middleware.instrumentation.summary_view", name="instrumentation_summary"),
     url(r"^admin/doc/", include("django.contrib.admindocs.urls")),
     url(r"^admin/(.*)", admin.site.root),
 )